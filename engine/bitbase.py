@@ -0,0 +1,253 @@
+import os
+import sys
+import zlib
+import struct
+import numpy as np
+from engine.move_constants import Piece
+from engine.bitutils import get_lsb, popcount, iter_squares
+import engine.move_generator as mgenerator
+
+# Win, draw or loss of every king and pawn and king and rook against king
+# position, found by retrograde analysis with this engine's rules: pawns
+# don't promote and a side without legal moves loses, like evaluate scores it.
+# Positions are seen with the side that has the piece as white, the index is
+# ((side to move * 64 + strong king) * 64 + weak king) * 64 + piece square
+# with side to move 0 when the strong side moves
+BITBASE_PIECES = (Piece.PAWN, Piece.ROOK)
+BITBASE_SIZE = 2 * 64 * 64 * 64
+
+# Result for the side to move
+DRAW = 0
+WIN = 1
+LOSS = 2
+
+# Bitbases are cached in a binary file, next to this module unless
+# PYCHESS_BITBASE_PATH points somewhere else. The file is a header followed
+# by a bit array of wins and one of losses for each piece of BITBASE_PIECES,
+# bit i of the array is bit i % 8 of byte i // 8
+BITBASE_FILE_NAME = "bitbases.bin"
+BITBASE_FILE_MAGIC = b"PYCHBB\0\0"
+BITBASE_FILE_VERSION = 1
+# magic, version, positions per table, crc32 of the data
+BITBASE_HEADER = struct.Struct("=8sIQI")
+
+def get_bitbase_path():
+    path = os.environ.get("PYCHESS_BITBASE_PATH")
+    if path:
+        return path
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), BITBASE_FILE_NAME)
+
+class Bitbases():
+    def __init__(self):
+        # Piece type to (wins, losses) bit arrays
+        self.tables = {}
+
+    # Retrograde analysis of every table, takes several seconds
+    def build(self):
+        for piece_type in BITBASE_PIECES:
+            wins, losses = build_bitbase(piece_type)
+            self.tables[piece_type] = (np.packbits(wins, bitorder='little').tobytes(),
+                                       np.packbits(losses, bitorder='little').tobytes())
+
+    # Returns False if the file is missing, from another version or corrupted
+    def load(self, path):
+        try:
+            with open(path, 'rb') as bitbase_file:
+                data = bitbase_file.read()
+        except OSError:
+            return False
+
+        if len(data) < BITBASE_HEADER.size:
+            return False
+        magic, version, size, checksum = BITBASE_HEADER.unpack_from(data)
+        if magic != BITBASE_FILE_MAGIC or version != BITBASE_FILE_VERSION or size != BITBASE_SIZE:
+            return False
+
+        data = data[BITBASE_HEADER.size:]
+        table_bytes = BITBASE_SIZE // 8
+        if len(data) != 2 * table_bytes * len(BITBASE_PIECES) or zlib.crc32(data) != checksum:
+            return False
+
+        for i, piece_type in enumerate(BITBASE_PIECES):
+            start = 2 * i * table_bytes
+            self.tables[piece_type] = (data[start:start + table_bytes], data[start + table_bytes:start + 2 * table_bytes])
+
+        return True
+
+    # Written through a temporary file like the magic tables
+    def save(self, path):
+        data = b"".join(self.tables[piece_type][0] + self.tables[piece_type][1] for piece_type in BITBASE_PIECES)
+        header = BITBASE_HEADER.pack(BITBASE_FILE_MAGIC, BITBASE_FILE_VERSION, BITBASE_SIZE, zlib.crc32(data))
+        temp_path = "%s.%d.tmp" % (path, os.getpid())
+        try:
+            with open(temp_path, 'wb') as outfile:
+                outfile.write(header)
+                outfile.write(data)
+            os.replace(temp_path, path)
+        except OSError as error:
+            print("---- could not save bitbases: %s ----" % error)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    ## Returns WIN, DRAW or LOSS for the side to move, None if the material isn't in the bitbases ##
+    def probe(self, cb):
+        for piece_type in BITBASE_PIECES:
+            pieces = cb.pieceBB[piece_type]
+            if pieces:
+                break
+        else:
+            return None
+
+        strong = Piece.WHITE if pieces & cb.pieceBB[Piece.WHITE] else Piece.BLACK
+        weak = strong ^ 1
+        square = get_lsb(pieces)
+        strong_king = get_lsb(cb.pieceBB[strong] & cb.pieceBB[Piece.KING])
+        weak_king = get_lsb(cb.pieceBB[weak] & cb.pieceBB[Piece.KING])
+        # Black pawns move down the board, flipping the ranks makes them white
+        if strong == Piece.BLACK:
+            square = square ^ 56
+            strong_king = strong_king ^ 56
+            weak_king = weak_king ^ 56
+
+        side = 0 if cb.player_turn == strong else 1
+        index = ((side * 64 + strong_king) * 64 + weak_king) * 64 + square
+        wins, losses = self.tables[piece_type]
+        if (wins[index >> 3] >> (index & 7)) & 1:
+            return WIN
+        if (losses[index >> 3] >> (index & 7)) & 1:
+            return LOSS
+        return DRAW
+
+shared_bitbases = None
+# Set once the file couldn't be loaded so searches don't try it again
+load_failed = False
+
+## Bitbases shared by every search, loaded or built and saved if the file is missing ##
+## Called before searching, by the gui at startup or python -m engine.bitbase ##
+def get_bitbases():
+    global shared_bitbases
+    if shared_bitbases is None:
+        bitbases = Bitbases()
+        path = get_bitbase_path()
+        if bitbases.load(path):
+            print("---- loading bitbases ----")
+        else:
+            print("---- building bitbases ----")
+            bitbases.build()
+            bitbases.save(path)
+        shared_bitbases = bitbases
+    return shared_bitbases
+
+## Shared bitbases loaded from the file, None if it is missing. Never builds them ##
+def load_bitbases():
+    global shared_bitbases, load_failed
+    if shared_bitbases is None and not load_failed:
+        bitbases = Bitbases()
+        if bitbases.load(get_bitbase_path()):
+            shared_bitbases = bitbases
+        else:
+            load_failed = True
+    return shared_bitbases
+
+## Probe the shared bitbases, None unless only two kings and a pawn or rook are left ##
+## Searches only use bitbases already built, without them nothing is probed ##
+def probe(cb):
+    if popcount(cb.pieceBB[Piece.WHITE] | cb.pieceBB[Piece.BLACK]) != 3:
+        return None
+    bitbases = load_bitbases()
+    if bitbases is None:
+        return None
+    return bitbases.probe(cb)
+
+## Returns (wins, losses) boolean arrays of the side to move for piece_type ##
+def build_bitbase(piece_type):
+    generator = mgenerator.get_generator()
+    king_moves = generator.king_moves
+
+    # Moves are kept as one array of successor indices with the first one of
+    # each position in starts. Taking the piece leaves a drawn position,
+    # the extra index BITBASE_SIZE that is never a win or a loss
+    successors = []
+    starts = np.zeros(BITBASE_SIZE, dtype=np.int64)
+    counts = np.zeros(BITBASE_SIZE, dtype=np.int64)
+    valid = np.zeros(BITBASE_SIZE, dtype=bool)
+
+    for side in (0, 1):
+        for strong_king in range(64):
+            for weak_king in range(64):
+                if weak_king == strong_king or king_moves[strong_king] & (1 << weak_king):
+                    continue
+                for square in range(64):
+                    if square == strong_king or square == weak_king:
+                        continue
+                    # White pawns never stand on the first rank
+                    if piece_type == Piece.PAWN and square < 8:
+                        continue
+
+                    occupied = (1 << strong_king) | (1 << weak_king) | (1 << square)
+                    if piece_type == Piece.PAWN:
+                        attacks = generator.pawn_attacks[square][Piece.WHITE]
+                    else:
+                        # Seen through the weak king, like generate_legal_moves does
+                        attacks = generator.rook_attacks(square, occupied ^ (1 << weak_king))
+                    # The side that just moved can't be left in check
+                    if side == 0 and attacks & (1 << weak_king):
+                        continue
+
+                    index = ((side * 64 + strong_king) * 64 + weak_king) * 64 + square
+                    valid[index] = True
+                    starts[index] = len(successors)
+                    if side == 0:
+                        base = ((64 + strong_king) * 64 + weak_king) * 64
+                        for target in iter_squares(king_moves[strong_king] & ~king_moves[weak_king] & ~(1 << square)):
+                            successors.append(base - strong_king * 4096 + target * 4096 + square)
+                        if piece_type == Piece.PAWN:
+                            for target in iter_squares(pawn_pushes(generator, square, occupied)):
+                                successors.append(base + target)
+                        else:
+                            for target in iter_squares(attacks & ~(1 << strong_king)):
+                                successors.append(base + target)
+                    else:
+                        base = (strong_king * 64) * 64
+                        for target in iter_squares(king_moves[weak_king] & ~(king_moves[strong_king] | attacks)):
+                            if target == square:
+                                successors.append(BITBASE_SIZE)
+                            else:
+                                successors.append(base + target * 64 + square)
+                    counts[index] = len(successors) - starts[index]
+
+    successors = np.array(successors, dtype=np.int64)
+    wins = np.zeros(BITBASE_SIZE + 1, dtype=bool)
+    losses = np.zeros(BITBASE_SIZE + 1, dtype=bool)
+    # No legal moves loses, check or not
+    losses[:BITBASE_SIZE] = valid & (counts == 0)
+
+    # A position is won if a move reaches a position lost for the opponent
+    # and lost if every move reaches one the opponent wins. Repeat until
+    # nothing changes, what is left is drawn
+    positions = np.nonzero(counts)[0]
+    offsets = starts[positions]
+    while True:
+        position_wins = np.logical_or.reduceat(losses[successors], offsets)
+        position_losses = np.logical_and.reduceat(wins[successors], offsets)
+        if (position_wins == wins[positions]).all() and (position_losses == losses[positions]).all():
+            break
+        wins[positions] = position_wins
+        losses[positions] = position_losses
+
+    return wins[:BITBASE_SIZE], losses[:BITBASE_SIZE]
+
+# White pawn pushes, blocked by any piece in front
+def pawn_pushes(generator, square, occupied):
+    if square >= 56 or occupied & (1 << (square + 8)):
+        return 0
+    if square < 16 and not occupied & (1 << (square + 16)):
+        return (1 << (square + 8)) | (1 << (square + 16))
+    return 1 << (square + 8)
+
+if __name__ == "__main__":
+    # Build the bitbase file ahead of time
+    if os.path.exists(get_bitbase_path()):
+        os.remove(get_bitbase_path())
+    get_bitbases()
+    sys.exit(0)
@@ -0,0 +1,23 @@
+## Bit twiddling helpers for bitboards stored as python ints ##
+
+## Get least significant bit ##
+def get_lsb(n):
+    return (n & -n).bit_length() - 1
+
+## Get most significant bit ##
+def get_msb(n):
+    return n.bit_length() - 1
+
+## Number of set bits ##
+if hasattr(int, "bit_count"):
+    popcount = int.bit_count
+else:
+    def popcount(n):
+        return bin(n).count("1")
+
+## Yields the square of every set bit, from the least significant ##
+def iter_squares(n):
+    while n:
+        lsb = n & -n
+        yield lsb.bit_length() - 1
+        n = n ^ lsb
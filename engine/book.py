@@ -0,0 +1,118 @@
+import os
+import mmap
+import random
+import struct
+from engine.move_constants import Piece, Square, piece_code, NULL_MOVE
+from engine.move_constants import MOVE_SQUARE_MASK, MOVE_TO_SHIFT, MOVE_PIECE_SHIFT, MOVE_CASTLE
+import engine.zobrist as zobrist
+
+# Polyglot opening books are files of 16 byte big endian entries sorted by
+# key: position key, move, weight and a learn field that isn't used here.
+# Moves are to square | from square << 6 | promotion << 12, castling is
+# written as the king taking its own rook
+BOOK_ENTRY = struct.Struct(">QHHI")
+BOOK_MOVE_MASK = 63
+BOOK_FROM_SHIFT = 6
+
+# Book loaded by load_book, PYCHESS_BOOK_PATH points to it
+def get_book_path():
+    return os.environ.get("PYCHESS_BOOK_PATH")
+
+## Open the book at path, by default get_book_path. None if there is none ##
+def load_book(path=None):
+    if path is None:
+        path = get_book_path()
+    if not path:
+        return None
+
+    try:
+        return OpeningBook(path)
+    except (OSError, ValueError):
+        return None
+
+## Polyglot key of the position, hash_key plus the en passant file ##
+def book_key(cb):
+    key = cb.hash_key
+    if not cb.move_history:
+        return key
+
+    # The file only counts after a double pawn push next to an enemy pawn
+    move = cb.move_history[-1]
+    square_from = move & MOVE_SQUARE_MASK
+    square_to = (move >> MOVE_TO_SHIFT) & MOVE_SQUARE_MASK
+    if move != NULL_MOVE and (move >> MOVE_PIECE_SHIFT) & 7 == Piece.PAWN and abs(square_to - square_from) == 16:
+        file = square_to & 7
+        pawn = piece_code(cb.player_turn, Piece.PAWN)
+        if (file > 0 and cb.current_board[square_to - 1] == pawn) or (file < 7 and cb.current_board[square_to + 1] == pawn):
+            key = key ^ zobrist.en_passant_keys[file]
+
+    return key
+
+# Move encoded the way the book writes it
+def book_move(move):
+    square_from = move & MOVE_SQUARE_MASK
+    square_to = (move >> MOVE_TO_SHIFT) & MOVE_SQUARE_MASK
+    if move & MOVE_CASTLE:
+        if square_to == Square.G1 or square_to == Square.G8:
+            square_to = square_to + 1
+        else:
+            square_to = square_to - 2
+
+    return square_to | (square_from << BOOK_FROM_SHIFT)
+
+class OpeningBook():
+    # The file is mapped read only and searched in place
+    def __init__(self, path):
+        with open(path, 'rb') as book_file:
+            self.data = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self.data) // BOOK_ENTRY.size
+
+    def __len__(self):
+        return self.size
+
+    def close(self):
+        self.data.close()
+
+    ## Returns (book move, weight) of every entry of key ##
+    def entries(self, key):
+        # Binary search for the first entry of the key
+        low = 0
+        high = self.size
+        while low < high:
+            middle = (low + high) // 2
+            if BOOK_ENTRY.unpack_from(self.data, middle * BOOK_ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        results = []
+        for index in range(low, self.size):
+            entry_key, move, weight, learn = BOOK_ENTRY.unpack_from(self.data, index * BOOK_ENTRY.size)
+            if entry_key != key:
+                break
+            results.append((move, weight))
+
+        return results
+
+    ## Returns (move, weight) of the book moves of the position that are legal ##
+    def get_moves(self, cb):
+        entries = self.entries(book_key(cb))
+        if not entries:
+            return []
+
+        # Promotions don't match any move since this engine doesn't make them
+        legal_moves = {book_move(move): move for move in cb.generate_legal_moves(cb.player_turn)}
+        return [(legal_moves[move], weight) for move, weight in entries if move in legal_moves]
+
+    ## Pick a book move with a chance proportional to its weight, NULL_MOVE if there is none ##
+    def choose_move(self, cb, rng=random):
+        moves = self.get_moves(cb)
+        total = sum(weight for move, weight in moves)
+        if total == 0:
+            return NULL_MOVE
+
+        pick = rng.randrange(total)
+        for move, weight in moves:
+            if pick < weight:
+                return move
+            pick = pick - weight
@@ -1,8 +1,17 @@
-import numpy as np
-import pickle
-import os
-from engine.move_constants import Move, Piece, Square, Direction
+from engine.move_constants import Move, Piece, Square, Direction, encode_move, piece_code
+from engine.move_constants import EMPTY, PIECE_TYPE_MASK, NULL_MOVE
+from engine.bitutils import get_lsb, get_msb, iter_squares, popcount
+from engine.move_constants import MOVE_SQUARE_MASK, MOVE_TO_SHIFT, MOVE_PIECE_SHIFT, MOVE_COLOR_SHIFT, MOVE_CAPTURE_SHIFT, MOVE_CASTLE
 import engine.move_generator as mgenerator
+import engine.zobrist as zobrist
+import engine.psqt as psqt
+from engine.move_generator import BOARD_MASK
+
+# Files and ranks used to shift every pawn of a side at once
+A_FILE = 72340172838076673
+H_FILE = A_FILE << 7
+THIRD_RANK = 255 << 16
+SIXTH_RANK = 255 << 40
 
 class Chess():
     def __init__(self):
@@ -14,43 +23,48 @@ class Chess():
         self.castleH8 = True
         self.pinned_pieces = {}
         self.move_history = []
-        self.generator = mgenerator.MoveGenerator()
+        self.undo_stack = []
+        self.move_buffers = []
+        self.generator = mgenerator.get_generator()
 
         ## Initial Bitboard for piece and color ##
         ## Order by white, black, pawn, knight, bishop, rook, queen and king ##
-        self.pieceBB = np.array((65535,
-                                18446462598732840960,
-                                71776119061282560,
-                                4755801206503243842,
-                                2594073385365405732,
-                                9295429630892703873,
-                                576460752303423496,
-                                1152921504606846992), dtype=np.uint64)
+        self.pieceBB = [65535,
+                        18446462598732840960,
+                        71776119061282560,
+                        4755801206503243842,
+                        2594073385365405732,
+                        9295429630892703873,
+                        576460752303423496,
+                        1152921504606846992]
 
         self.current_board = None
         self.update_current_board()
+        self.hash_key = zobrist.hash_position(self)
+        self.psqt_middlegame, self.psqt_endgame = psqt.score_position(self)
+        self.phase = psqt.game_phase(self)
 
     def get_fen_position(self):
         fen = ""
         square = Square.A8
         fen_notation = {
-            (Piece.BLACK, Piece.ROOK): "r", 
-            (Piece.BLACK, Piece.KNIGHT): "n",
-            (Piece.BLACK, Piece.BISHOP): "b",
-            (Piece.BLACK, Piece.QUEEN): "q",
-            (Piece.BLACK, Piece.KING): "k",
-            (Piece.BLACK, Piece.PAWN): "p",
-            (Piece.WHITE, Piece.ROOK): "R", 
-            (Piece.WHITE, Piece.KNIGHT): "N",
-            (Piece.WHITE, Piece.BISHOP): "B",
-            (Piece.WHITE, Piece.QUEEN): "Q",
-            (Piece.WHITE, Piece.KING): "K",
-            (Piece.WHITE, Piece.PAWN): "P"
+            piece_code(Piece.BLACK, Piece.ROOK): "r", 
+            piece_code(Piece.BLACK, Piece.KNIGHT): "n",
+            piece_code(Piece.BLACK, Piece.BISHOP): "b",
+            piece_code(Piece.BLACK, Piece.QUEEN): "q",
+            piece_code(Piece.BLACK, Piece.KING): "k",
+            piece_code(Piece.BLACK, Piece.PAWN): "p",
+            piece_code(Piece.WHITE, Piece.ROOK): "R", 
+            piece_code(Piece.WHITE, Piece.KNIGHT): "N",
+            piece_code(Piece.WHITE, Piece.BISHOP): "B",
+            piece_code(Piece.WHITE, Piece.QUEEN): "Q",
+            piece_code(Piece.WHITE, Piece.KING): "K",
+            piece_code(Piece.WHITE, Piece.PAWN): "P"
         }
         empty_square = 0
 
         while square >= 0:
-            if self.current_board[square] is None:
+            if self.current_board[square] == EMPTY:
                 empty_square = empty_square + 1
             elif empty_square > 0:
                 fen = fen + str(empty_square)
@@ -94,12 +108,13 @@ class Chess():
 
         #Initialize an empty board
         self.move_history = []
+        self.undo_stack = []
         self.game_over = False
         self.castleH1 = False
         self.castleA1 = False
         self.castleH8 = False
         self.castleA8 = False
-        self.pieceBB = np.array((0, 0, 0, 0, 0, 0, 0, 0), dtype=np.uint64)
+        self.pieceBB = [0, 0, 0, 0, 0, 0, 0, 0]
 
         split_fen = fen.split()
 
@@ -121,11 +136,11 @@ class Chess():
         #Set board
         for i in split_fen[0]:
             if square < 0: break
-            square_bb = np.uint64(1) << np.uint64(square)
+            square_bb = 1 << square
             
             if i in fen_notation:
-                self.pieceBB[fen_notation[i][1]] = np.bitwise_or(self.pieceBB[fen_notation[i][1]], square_bb)
-                self.pieceBB[fen_notation[i][0]] = np.bitwise_or(self.pieceBB[fen_notation[i][0]], square_bb)
+                self.pieceBB[fen_notation[i][1]] = self.pieceBB[fen_notation[i][1]] | square_bb
+                self.pieceBB[fen_notation[i][0]] = self.pieceBB[fen_notation[i][0]] | square_bb
 
             #Empty squares
             if i.isdigit():    
@@ -158,118 +173,143 @@ class Chess():
                 self.castleA8 = True
 
         self.update_current_board()
+        self.hash_key = zobrist.hash_position(self)
+        self.psqt_middlegame, self.psqt_endgame = psqt.score_position(self)
+        self.phase = psqt.game_phase(self)
 
-    ## Get all pieces sets ##
+    ## Rebuild the board of piece codes from the bitboards ##
     def update_current_board(self):
-        pieces = [None]*64
-
-        white_pawn = np.bitwise_and(self.pieceBB[Piece.WHITE], self.pieceBB[Piece.PAWN])
-        white_knight = np.bitwise_and(self.pieceBB[Piece.WHITE], self.pieceBB[Piece.KNIGHT])
-        white_bishop = np.bitwise_and(self.pieceBB[Piece.WHITE], self.pieceBB[Piece.BISHOP])
-        white_rook = np.bitwise_and(self.pieceBB[Piece.WHITE], self.pieceBB[Piece.ROOK])
-        white_queen = np.bitwise_and(self.pieceBB[Piece.WHITE], self.pieceBB[Piece.QUEEN])
-        white_king = np.bitwise_and(self.pieceBB[Piece.WHITE], self.pieceBB[Piece.KING])
-
-        black_pawn = np.bitwise_and(self.pieceBB[Piece.BLACK], self.pieceBB[Piece.PAWN])
-        black_knight = np.bitwise_and(self.pieceBB[Piece.BLACK], self.pieceBB[Piece.KNIGHT])
-        black_bishop = np.bitwise_and(self.pieceBB[Piece.BLACK], self.pieceBB[Piece.BISHOP])
-        black_rook = np.bitwise_and(self.pieceBB[Piece.BLACK], self.pieceBB[Piece.ROOK])
-        black_queen = np.bitwise_and(self.pieceBB[Piece.BLACK], self.pieceBB[Piece.QUEEN])
-        black_king = np.bitwise_and(self.pieceBB[Piece.BLACK], self.pieceBB[Piece.KING])
-
-        for i in range(64):
-            square = np.uint64(1) << np.uint64(i)
-            if np.bitwise_and(square, white_pawn) > 0:
-                pieces[i] = (Piece.WHITE, Piece.PAWN) 
-            elif np.bitwise_and(square, white_knight) > 0:
-                pieces[i] = (Piece.WHITE, Piece.KNIGHT) 
-            elif np.bitwise_and(square, white_bishop) > 0:
-                pieces[i] = (Piece.WHITE, Piece.BISHOP) 
-            elif np.bitwise_and(square, white_rook) > 0:
-                pieces[i] = (Piece.WHITE, Piece.ROOK) 
-            elif np.bitwise_and(square, white_queen) > 0:
-                pieces[i] = (Piece.WHITE, Piece.QUEEN) 
-            elif np.bitwise_and(square, white_king) > 0:
-                pieces[i] = (Piece.WHITE, Piece.KING)
-            elif np.bitwise_and(square, black_pawn) > 0:
-                pieces[i] = (Piece.BLACK, Piece.PAWN)  
-            elif np.bitwise_and(square, black_knight) > 0:
-                pieces[i] = (Piece.BLACK, Piece.KNIGHT)  
-            elif np.bitwise_and(square, black_bishop) > 0:
-                pieces[i] = (Piece.BLACK, Piece.BISHOP)  
-            elif np.bitwise_and(square, black_rook) > 0:
-                pieces[i] = (Piece.BLACK, Piece.ROOK)  
-            elif np.bitwise_and(square, black_queen) > 0:
-                pieces[i] = (Piece.BLACK, Piece.QUEEN)  
-            elif np.bitwise_and(square, black_king) > 0:
-                pieces[i] = (Piece.BLACK, Piece.KING)  
-                
-        self.current_board = pieces 
+        pieces = bytearray(64)
+
+        for piece_color in (Piece.WHITE, Piece.BLACK):
+            for piece_type in (Piece.PAWN, Piece.KNIGHT, Piece.BISHOP, Piece.ROOK, Piece.QUEEN, Piece.KING):
+                bitboard = self.pieceBB[piece_color] & self.pieceBB[piece_type]
+                for square in iter_squares(bitboard):
+                    pieces[square] = piece_code(piece_color, piece_type)
+
+        self.current_board = pieces
 
     # Called to move the rook when the move is castling
-    def castle_rook(self, move):
+    def castle_rook(self, piece_color, square_to):
         rook_square_from = 0
         rook_square_to = 0
-        if move.square_to == Square.G1:
+        if square_to == Square.G1:
             rook_square_from = Square.H1
             rook_square_to = Square.F1
-        elif move.square_to == Square.C1:
+        elif square_to == Square.C1:
             rook_square_from = Square.A1
             rook_square_to = Square.D1
-        elif move.square_to == Square.G8:
+        elif square_to == Square.G8:
             rook_square_from = Square.H8
             rook_square_to = Square.F8
         else:
             rook_square_from = Square.A8
             rook_square_to = Square.D8
 
-        fromBB = np.uint64(1) << np.uint64(rook_square_from)
-        toBB = np.uint64(1) << np.uint64(rook_square_to)
-        fromToBB = np.bitwise_xor(fromBB, toBB)
-        self.pieceBB[move.piece_color] = np.bitwise_xor(fromToBB, self.pieceBB[move.piece_color])
-        self.pieceBB[Piece.ROOK] = np.bitwise_xor(fromToBB, self.pieceBB[Piece.ROOK])
+        fromBB = 1 << rook_square_from
+        toBB = 1 << rook_square_to
+        fromToBB = fromBB ^ toBB
+        self.pieceBB[piece_color] = fromToBB ^ self.pieceBB[piece_color]
+        self.pieceBB[Piece.ROOK] = fromToBB ^ self.pieceBB[Piece.ROOK]
+        # Swapping the squares moves the rook both ways
+        board = self.current_board
+        board[rook_square_from], board[rook_square_to] = board[rook_square_to], board[rook_square_from]
 
-        if move.piece_color == Piece.WHITE:
+        if piece_color == Piece.WHITE:
             self.castleA1 = False
             self.castleH1 = False
         else:
             self.castleA8 = False
             self.castleH8 = False
 
+        return rook_square_from, rook_square_to
+
     #Play a move
     def move(self, move):
+        self.make_move(move.to_int())
+
+    #Play a move encoded as int
+    def make_move(self, move):
+        square_from = move & MOVE_SQUARE_MASK
+        square_to = (move >> MOVE_TO_SHIFT) & MOVE_SQUARE_MASK
+        piece_type = (move >> MOVE_PIECE_SHIFT) & 7
+        piece_color = (move >> MOVE_COLOR_SHIFT) & 1
+        cpiece_type = (move >> MOVE_CAPTURE_SHIFT) & 7
+
+        # Save the state that can't be recovered from the move itself
+        self.undo_stack.append((self.castleA1, self.castleH1, self.castleA8, self.castleH8, self.game_over, self.hash_key, self.psqt_middlegame, self.psqt_endgame, self.phase))
+
+        piece = self.current_board[square_from]
+        hash_key = self.hash_key ^ zobrist.castle_key(self.castleA1, self.castleH1, self.castleA8, self.castleH8)
+        hash_key = hash_key ^ zobrist.piece_keys[piece][square_from] ^ zobrist.piece_keys[piece][square_to]
+        # Material and piece square scores for white and the game phase,
+        # updated like the hash
+        middlegame_values = psqt.piece_square_middlegame
+        endgame_values = psqt.piece_square_endgame
+        middlegame = self.psqt_middlegame + middlegame_values[piece][square_to] - middlegame_values[piece][square_from]
+        endgame = self.psqt_endgame + endgame_values[piece][square_to] - endgame_values[piece][square_from]
+        if cpiece_type:
+            captured = self.current_board[square_to]
+            hash_key = hash_key ^ zobrist.piece_keys[captured][square_to]
+            middlegame = middlegame - middlegame_values[captured][square_to]
+            endgame = endgame - endgame_values[captured][square_to]
+            self.phase = self.phase - psqt.phase_values[cpiece_type]
+
         #Check if move is castling and move the rook   
-        if move.castle:
-            self.castle_rook(move)
+        if move & MOVE_CASTLE:
+            rook_square_from, rook_square_to = self.castle_rook(piece_color, square_to)
+            rook = piece_code(piece_color, Piece.ROOK)
+            hash_key = hash_key ^ zobrist.piece_keys[rook][rook_square_from] ^ zobrist.piece_keys[rook][rook_square_to]
+            middlegame = middlegame + middlegame_values[rook][rook_square_to] - middlegame_values[rook][rook_square_from]
+            endgame = endgame + endgame_values[rook][rook_square_to] - endgame_values[rook][rook_square_from]
         #Check if the king move and disable castling
-        elif move.piece_type == Piece.KING:
-            if move.piece_color == Piece.WHITE:
+        elif piece_type == Piece.KING:
+            if piece_color == Piece.WHITE:
                 self.castleA1 = False
                 self.castleH1 = False
             else:
                 self.castleA8 = False
                 self.castleH8 = False
         #Check which rook move and disable castling
-        elif move.piece_type == Piece.ROOK:  
-            if move.square_from == Square.A1:
+        elif piece_type == Piece.ROOK:  
+            if square_from == Square.A1:
+                self.castleA1 = False
+            elif square_from == Square.H1:
+                self.castleH1 = False
+            elif square_from == Square.A8:
+                self.castleA8 = False
+            elif square_from == Square.H8:
+                self.castleH8 = False
+        #A captured rook can't castle either
+        if cpiece_type == Piece.ROOK:
+            if square_to == Square.A1:
                 self.castleA1 = False
-            elif move.square_from == Square.H1:
+            elif square_to == Square.H1:
                 self.castleH1 = False
-            elif move.square_from == Square.A8:
+            elif square_to == Square.A8:
                 self.castleA8 = False
-            elif move.square_from == Square.H8:
+            elif square_to == Square.H8:
                 self.castleH8 = False
 
-        fromBB = np.uint64(1) << np.uint64(move.square_from)
-        toBB = np.uint64(1) << np.uint64(move.square_to)
-        fromToBB = np.bitwise_xor(fromBB, toBB)
+        fromBB = 1 << square_from
+        toBB = 1 << square_to
+        fromToBB = fromBB ^ toBB
 
-        if(move.is_capture()):
-            self.pieceBB[move.cpiece_color] = np.bitwise_xor(toBB, self.pieceBB[move.cpiece_color])
-            self.pieceBB[move.cpiece_type] = np.bitwise_xor(toBB, self.pieceBB[move.cpiece_type])
+        if cpiece_type:
+            self.pieceBB[piece_color ^ 1] = toBB ^ self.pieceBB[piece_color ^ 1]
+            self.pieceBB[cpiece_type] = toBB ^ self.pieceBB[cpiece_type]
 
-        self.pieceBB[move.piece_color] = np.bitwise_xor(fromToBB, self.pieceBB[move.piece_color])
-        self.pieceBB[move.piece_type] = np.bitwise_xor(fromToBB, self.pieceBB[move.piece_type])
+        self.pieceBB[piece_color] = fromToBB ^ self.pieceBB[piece_color]
+        self.pieceBB[piece_type] = fromToBB ^ self.pieceBB[piece_type]
+
+        # Update only the squares the move touched
+        self.current_board[square_to] = piece
+        self.current_board[square_from] = EMPTY
+
+        hash_key = hash_key ^ zobrist.castle_key(self.castleA1, self.castleH1, self.castleA8, self.castleH8)
+        self.hash_key = hash_key ^ zobrist.white_to_move_key
+        self.psqt_middlegame = middlegame
+        self.psqt_endgame = endgame
 
         self.move_history.append(move)
 
@@ -279,257 +319,324 @@ class Chess():
         else:
             self.player_turn = Piece.WHITE
 
-        # Update current board using the bitboards
-        self.update_current_board()
+    #Take back the last move played
+    def unmove(self):
+        if self.move_history[-1] == NULL_MOVE:
+            self.unmake_null_move()
+            return
+
+        move = self.move_history.pop()
+        square_from = move & MOVE_SQUARE_MASK
+        square_to = (move >> MOVE_TO_SHIFT) & MOVE_SQUARE_MASK
+        piece_type = (move >> MOVE_PIECE_SHIFT) & 7
+        piece_color = (move >> MOVE_COLOR_SHIFT) & 1
+        cpiece_type = (move >> MOVE_CAPTURE_SHIFT) & 7
+
+        # Bitboard updates are xors so playing them again undoes them
+        if move & MOVE_CASTLE:
+            self.castle_rook(piece_color, square_to)
+
+        fromBB = 1 << square_from
+        toBB = 1 << square_to
+        fromToBB = fromBB ^ toBB
+
+        self.pieceBB[piece_color] = fromToBB ^ self.pieceBB[piece_color]
+        self.pieceBB[piece_type] = fromToBB ^ self.pieceBB[piece_type]
+
+        if cpiece_type:
+            self.pieceBB[piece_color ^ 1] = toBB ^ self.pieceBB[piece_color ^ 1]
+            self.pieceBB[cpiece_type] = toBB ^ self.pieceBB[cpiece_type]
+
+        # Put back the moved piece and the captured one
+        self.current_board[square_from] = self.current_board[square_to]
+        if cpiece_type:
+            self.current_board[square_to] = piece_code(piece_color ^ 1, cpiece_type)
+        else:
+            self.current_board[square_to] = EMPTY
+
+        self.player_turn = Piece.WHITE if piece_color == Piece.WHITE else Piece.BLACK
+
+        # Castling rights, the hash, the scores and the phase are restored as they were
+        (self.castleA1, self.castleH1, self.castleA8, self.castleH8, self.game_over, self.hash_key, self.psqt_middlegame, self.psqt_endgame, self.phase) = self.undo_stack.pop()
+
+    #Pass the turn to the other player, only used by the search
+    def make_null_move(self):
+        self.undo_stack.append((self.castleA1, self.castleH1, self.castleA8, self.castleH8, self.game_over, self.hash_key, self.psqt_middlegame, self.psqt_endgame, self.phase))
+        self.move_history.append(NULL_MOVE)
+        self.player_turn = Piece.BLACK if self.player_turn == Piece.WHITE else Piece.WHITE
+        self.hash_key = self.hash_key ^ zobrist.white_to_move_key
+
+    #Take back a null move, unmove calls it when the last move was one
+    def unmake_null_move(self):
+        self.move_history.pop()
+        self.player_turn = Piece.BLACK if self.player_turn == Piece.WHITE else Piece.WHITE
+        (self.castleA1, self.castleH1, self.castleA8, self.castleH8, self.game_over, self.hash_key, self.psqt_middlegame, self.psqt_endgame, self.phase) = self.undo_stack.pop()
+
+    # Check if the king of player_color is attacked
+    def is_in_check(self, player_color):
+        king_square = get_lsb(self.pieceBB[player_color] & self.pieceBB[Piece.KING])
+        return self.attacks_to_square(king_square, player_color) != 0
 
     ## Returns all the legal moves on the current board given the player_color ##
     def get_legal_moves(self, player_color):
-        moves = []
+        return [Move.from_int(move) for move in self.generate_legal_moves(player_color)]
+
+    ## Returns the legal moves of player_color encoded as ints ##
+    ## Passing a ply reuses that ply's move buffer instead of a new list ##
+    def generate_legal_moves(self, player_color, ply=None):
+        if ply is None:
+            moves = []
+        else:
+            while len(self.move_buffers) <= ply:
+                self.move_buffers.append([])
+            moves = self.move_buffers[ply]
+            del moves[:]
+
         self.pinned_pieces = {}
         opp_color = None
         opp_color = Piece.BLACK if player_color == Piece.WHITE else Piece.WHITE
 
-        king_square = np.bitwise_and(self.pieceBB[player_color], self.pieceBB[Piece.KING])
-        king_square = self.generator.get_lsb(king_square)
+        king_square = self.pieceBB[player_color] & self.pieceBB[Piece.KING]
+        king_square = get_lsb(king_square)
 
         attacks_to_king = self.attacks_to_square(king_square, player_color)
-        occupied_squares = np.bitwise_or(self.pieceBB[Piece.WHITE], self.pieceBB[Piece.BLACK])
+        occupied_squares = self.pieceBB[Piece.WHITE] | self.pieceBB[Piece.BLACK]
 
         # Calculate opponent attacks so the king doesnt walk to check
-        opp_attacks = np.uint64(0)
-        for i in range(len(self.current_board)):
-            if self.current_board[i] == (opp_color, Piece.PAWN):
-                opp_attacks = np.bitwise_or(self.generator.pawn_attacks[i][opp_color], opp_attacks)
-            elif self.current_board[i] == (opp_color, Piece.KNIGHT):
-                opp_attacks = np.bitwise_or(self.generator.knight_moves[i], opp_attacks)
-            elif self.current_board[i] == (opp_color, Piece.BISHOP):
-                blockerboard = np.bitwise_and(self.generator.bishop_masks[i], occupied_squares)
-                opp_attacks = np.bitwise_or(self.generator.bishop_moveboard[i][blockerboard], opp_attacks)
-            elif self.current_board[i] == (opp_color, Piece.ROOK):
-                blockerboard = np.bitwise_and(self.generator.rook_masks[i], occupied_squares)
-                opp_attacks = np.bitwise_or(self.generator.rook_moveboard[i][blockerboard], opp_attacks)
-            elif self.current_board[i] == (opp_color, Piece.QUEEN):
-                bishop_blockerboard = np.bitwise_and(self.generator.bishop_masks[i], occupied_squares)
-                rook_blockerboard = np.bitwise_and(self.generator.rook_masks[i], occupied_squares)
-                moveboard = np.bitwise_or(self.generator.bishop_moveboard[i][bishop_blockerboard], self.generator.rook_moveboard[i][rook_blockerboard])
-                opp_attacks = np.bitwise_or(moveboard, opp_attacks)
+        # Only the set bits of each piece bitboard are visited. Sliders see
+        # through the king so it can't step back along their line, and the
+        # squares next to the other king are attacked too
+        opp_pieces = self.pieceBB[opp_color]
+        opp_king = opp_pieces & self.pieceBB[Piece.KING]
+        opp_attacks = self.generator.king_moves[get_lsb(opp_king)] if opp_king else 0
+        attack_occupancy = occupied_squares ^ (self.pieceBB[player_color] & self.pieceBB[Piece.KING])
+        pieces = opp_pieces & self.pieceBB[Piece.PAWN]
+        for i in iter_squares(pieces):
+            opp_attacks = self.generator.pawn_attacks[i][opp_color] | opp_attacks
+        pieces = opp_pieces & self.pieceBB[Piece.KNIGHT]
+        for i in iter_squares(pieces):
+            opp_attacks = self.generator.knight_moves[i] | opp_attacks
+        pieces = opp_pieces & (self.pieceBB[Piece.BISHOP] | self.pieceBB[Piece.QUEEN])
+        for i in iter_squares(pieces):
+            opp_attacks = self.generator.bishop_attacks(i, attack_occupancy) | opp_attacks
+        pieces = opp_pieces & (self.pieceBB[Piece.ROOK] | self.pieceBB[Piece.QUEEN])
+        for i in iter_squares(pieces):
+            opp_attacks = self.generator.rook_attacks(i, attack_occupancy) | opp_attacks
         
         # Map pinned pieces to allowed moves
-        rook_blockerboard = np.bitwise_and(occupied_squares, self.generator.rook_masks[king_square])
-        rook_and_queen = np.bitwise_or(self.pieceBB[Piece.QUEEN], self.pieceBB[Piece.ROOK])
-        opp_rook_queen = np.bitwise_and(rook_and_queen, self.pieceBB[opp_color])
-        pinners = np.bitwise_and(self.generator.rook_xrays[king_square][rook_blockerboard], opp_rook_queen)
+        king_rook_moves = self.generator.rook_attacks(king_square, occupied_squares)
+        king_rook_xrays = self.generator.rook_xray_attacks(king_square, occupied_squares)
+        rook_and_queen = self.pieceBB[Piece.QUEEN] | self.pieceBB[Piece.ROOK]
+        opp_rook_queen = rook_and_queen & self.pieceBB[opp_color]
+        pinners = king_rook_xrays & opp_rook_queen
         while pinners > 0:
-            pinner_square = self.generator.get_lsb(pinners)
-            blocker_moves = np.bitwise_or(self.generator.rook_moveboard[king_square][rook_blockerboard], self.generator.rook_xrays[king_square][rook_blockerboard])
-            blocker_moves = np.bitwise_and(blocker_moves, self.generator.rook_masks[pinner_square])
-            blocker = np.bitwise_and(self.generator.rook_masks[pinner_square], self.generator.rook_moveboard[king_square][rook_blockerboard])
-            blocker = np.bitwise_and(blocker, self.pieceBB[player_color])
-            pinner_square = np.uint64(1) << np.uint64(pinner_square)
-            blocker_moves = np.bitwise_or(blocker_moves, pinner_square)
+            pinner_square = get_lsb(pinners)
+            blocker_moves = king_rook_moves | king_rook_xrays
+            blocker_moves = blocker_moves & self.generator.rook_masks[pinner_square]
+            blocker = self.generator.rook_masks[pinner_square] & king_rook_moves
+            blocker = blocker & self.pieceBB[player_color]
+            pinner_square = 1 << pinner_square
+            blocker_moves = blocker_moves | pinner_square
             if blocker > 0:
-                blocker_square = self.generator.get_lsb(blocker)
+                blocker_square = get_lsb(blocker)
                 self.pinned_pieces[blocker_square] = blocker_moves
-            pinners = np.bitwise_xor(pinners, pinner_square)
+            pinners = pinners ^ pinner_square
 
-        bishop_blockerboard = np.bitwise_and(occupied_squares, self.generator.bishop_masks[king_square])
-        bishop_and_queen = np.bitwise_or(self.pieceBB[Piece.QUEEN], self.pieceBB[Piece.BISHOP])
-        opp_bishop_queen = np.bitwise_and(bishop_and_queen, self.pieceBB[opp_color])
-        pinners = np.bitwise_and(self.generator.bishop_xrays[king_square][bishop_blockerboard], opp_bishop_queen)
+        king_bishop_moves = self.generator.bishop_attacks(king_square, occupied_squares)
+        king_bishop_xrays = self.generator.bishop_xray_attacks(king_square, occupied_squares)
+        bishop_and_queen = self.pieceBB[Piece.QUEEN] | self.pieceBB[Piece.BISHOP]
+        opp_bishop_queen = bishop_and_queen & self.pieceBB[opp_color]
+        pinners = king_bishop_xrays & opp_bishop_queen
         while pinners > 0:
-            pinner_square = self.generator.get_lsb(pinners)
-            blocker_moves = np.bitwise_or(self.generator.bishop_moveboard[king_square][bishop_blockerboard], self.generator.bishop_xrays[king_square][bishop_blockerboard])
-            blocker_moves = np.bitwise_and(blocker_moves, self.generator.bishop_masks[pinner_square])
-            blocker = np.bitwise_and(self.generator.bishop_masks[pinner_square], self.generator.bishop_moveboard[king_square][bishop_blockerboard])
-            blocker = np.bitwise_and(blocker, self.pieceBB[player_color])
-            pinner_square = np.uint64(1) << np.uint64(pinner_square)
-            blocker_moves = np.bitwise_or(blocker_moves, pinner_square)
+            pinner_square = get_lsb(pinners)
+            blocker_moves = king_bishop_moves | king_bishop_xrays
+            blocker_moves = blocker_moves & self.generator.bishop_masks[pinner_square]
+            blocker = self.generator.bishop_masks[pinner_square] & king_bishop_moves
+            blocker = blocker & self.pieceBB[player_color]
+            pinner_square = 1 << pinner_square
+            blocker_moves = blocker_moves | pinner_square
             if blocker > 0:
-                blocker_square = self.generator.get_lsb(blocker)
+                blocker_square = get_lsb(blocker)
                 self.pinned_pieces[blocker_square] = blocker_moves
-            pinners = np.bitwise_xor(pinners, pinner_square)
+            pinners = pinners ^ pinner_square
 
         # There is no check
-        if bin(attacks_to_king).count("1") == 0:
-            for i in range(len(self.current_board)):
-                if self.current_board[i] == (player_color, Piece.PAWN):
-                    moves = moves + self.get_pawn_legal(player_color, i)
-                elif self.current_board[i] == (player_color, Piece.KNIGHT):
-                    moves = moves + self.get_knight_legal(player_color, i)
-                elif self.current_board[i] == (player_color, Piece.BISHOP):
-                    moves = moves + self.get_sliding_legal(player_color, i, Piece.BISHOP)
-                elif self.current_board[i] == (player_color, Piece.ROOK):
-                    moves = moves + self.get_sliding_legal(player_color, i, Piece.ROOK)
-                elif self.current_board[i] == (player_color, Piece.QUEEN):
-                    moves = moves + self.get_sliding_legal(player_color, i, Piece.QUEEN)
-                elif self.current_board[i] == (player_color, Piece.KING):
-                    moves = moves + self.get_king_legal(player_color, i, opp_attacks)
+        if attacks_to_king == 0:
+            self.get_pieces_legal(player_color, moves, opp_attacks)
         # There is a single check            
-        elif bin(attacks_to_king).count("1") == 1:
+        elif attacks_to_king & (attacks_to_king - 1) == 0:
             # Get squares that can block the check
-            attacker_square = self.generator.get_lsb(attacks_to_king)
+            attacker_square = get_lsb(attacks_to_king)
+            attacker_type = self.current_board[attacker_square] & PIECE_TYPE_MASK
             blocking_moves = None
-            if self.current_board[attacker_square] == (opp_color, Piece.PAWN):
-                blocking_moves = np.uint64(1 << attacker_square)
-            elif self.current_board[attacker_square] == (opp_color, Piece.KNIGHT):
-                blocking_moves = np.uint64(1 << attacker_square)
-            elif self.current_board[attacker_square] == (opp_color, Piece.BISHOP):
-                attacker_moves = np.bitwise_and(self.generator.bishop_masks[attacker_square], occupied_squares)
-                king_moves = np.bitwise_and(self.generator.bishop_masks[king_square], occupied_squares)
-                blocking_moves = np.bitwise_and(self.generator.bishop_moveboard[attacker_square][attacker_moves], self.generator.bishop_moveboard[king_square][king_moves])
-                blocking_moves = np.bitwise_or(np.uint64(1 << attacker_square), blocking_moves)
-            elif self.current_board[attacker_square] == (opp_color, Piece.ROOK):
-                attacker_moves = np.bitwise_and(self.generator.rook_masks[attacker_square], occupied_squares)
-                king_moves = np.bitwise_and(self.generator.rook_masks[king_square], occupied_squares)
-                blocking_moves = np.bitwise_and(self.generator.rook_moveboard[attacker_square][attacker_moves], self.generator.rook_moveboard[king_square][king_moves])
-                blocking_moves = np.bitwise_or(np.uint64(1 << attacker_square), blocking_moves)
-            elif self.current_board[attacker_square] == (opp_color, Piece.QUEEN):
+            if attacker_type == Piece.PAWN:
+                blocking_moves = 1 << attacker_square
+            elif attacker_type == Piece.KNIGHT:
+                blocking_moves = 1 << attacker_square
+            elif attacker_type == Piece.BISHOP:
+                attacker_moves = self.generator.bishop_attacks(attacker_square, occupied_squares)
+                king_moves = self.generator.bishop_attacks(king_square, occupied_squares)
+                blocking_moves = attacker_moves & king_moves
+                blocking_moves = (1 << attacker_square) | blocking_moves
+            elif attacker_type == Piece.ROOK:
+                attacker_moves = self.generator.rook_attacks(attacker_square, occupied_squares)
+                king_moves = self.generator.rook_attacks(king_square, occupied_squares)
+                blocking_moves = attacker_moves & king_moves
+                blocking_moves = (1 << attacker_square) | blocking_moves
+            elif attacker_type == Piece.QUEEN:
                 # Check if its line check or diagonal check
                 attacker_moves = None
                 king_moves = None
                 if abs(king_square - attacker_square) % 8 == 0 or (king_square//8) == (attacker_square//8):
-                    attacker_moves = np.bitwise_and(self.generator.rook_masks[attacker_square], occupied_squares)
-                    attacker_moves = self.generator.rook_moveboard[attacker_square][attacker_moves]
-                    king_moves = np.bitwise_and(self.generator.rook_masks[king_square], occupied_squares)
-                    king_moves = self.generator.rook_moveboard[king_square][king_moves]
+                    attacker_moves = self.generator.rook_attacks(attacker_square, occupied_squares)
+                    king_moves = self.generator.rook_attacks(king_square, occupied_squares)
                 else:
-                    attacker_moves = np.bitwise_and(self.generator.bishop_masks[attacker_square], occupied_squares)
-                    attacker_moves = self.generator.bishop_moveboard[attacker_square][attacker_moves]
-                    king_moves = np.bitwise_and(self.generator.bishop_masks[king_square], occupied_squares)
-                    king_moves = self.generator.bishop_moveboard[king_square][king_moves]
+                    attacker_moves = self.generator.bishop_attacks(attacker_square, occupied_squares)
+                    king_moves = self.generator.bishop_attacks(king_square, occupied_squares)
 
-                blocking_moves = np.bitwise_and(attacker_moves, king_moves)
-                blocking_moves = np.bitwise_or(np.uint64(1 << attacker_square), blocking_moves)
+                blocking_moves = attacker_moves & king_moves
+                blocking_moves = (1 << attacker_square) | blocking_moves
             # Add moves that block the check or king moves
-            for i in range(len(self.current_board)):
-                if self.current_board[i] == (player_color, Piece.PAWN):
-                    moves = moves + self.get_pawn_legal(player_color, i, blocking_moves)
-                elif self.current_board[i] == (player_color, Piece.KNIGHT):
-                    moves = moves + self.get_knight_legal(player_color, i, blocking_moves)
-                elif self.current_board[i] == (player_color, Piece.BISHOP):
-                    moves = moves + self.get_sliding_legal(player_color, i, Piece.BISHOP, blocking_moves)
-                elif self.current_board[i] == (player_color, Piece.ROOK):
-                    moves = moves + self.get_sliding_legal(player_color, i, Piece.ROOK, blocking_moves)
-                elif self.current_board[i] == (player_color, Piece.QUEEN):
-                    moves = moves + self.get_sliding_legal(player_color, i, Piece.QUEEN, blocking_moves)
-                elif self.current_board[i] == (player_color, Piece.KING):
-                    moves = moves + self.get_king_legal(player_color, i, opp_attacks)
+            self.get_pieces_legal(player_color, moves, opp_attacks, blocking_moves)
         # Double check            
         else: 
-            moves = moves + self.get_king_legal(player_color, king_square, opp_attacks)
+            self.get_king_legal(player_color, king_square, moves, opp_attacks)
 
         if not moves:
             self.game_over = True
-        else:
-            moves.sort(key=lambda x: x.is_capture(), reverse=True)
 
         return moves
 
+    ## Add the moves of every piece of player_color, visiting only the occupied squares ##
+    def get_pieces_legal(self, player_color, moves, opp_attacks, blocking_moves=BOARD_MASK):
+        for i in iter_squares(self.pieceBB[player_color]):
+            piece_type = self.current_board[i] & PIECE_TYPE_MASK
+            if piece_type == Piece.PAWN:
+                self.get_pawn_legal(player_color, i, moves, blocking_moves)
+            elif piece_type == Piece.KNIGHT:
+                self.get_knight_legal(player_color, i, moves, blocking_moves)
+            elif piece_type == Piece.KING:
+                self.get_king_legal(player_color, i, moves, opp_attacks)
+            else:
+                self.get_sliding_legal(player_color, i, moves, piece_type, blocking_moves)
+
     # Returns attacks to a square
     def attacks_to_square(self, square, piece_color):
         opp_color = None
         opp_color = Piece.BLACK if piece_color == Piece.WHITE else Piece.WHITE
 
-        occupiedBB = np.bitwise_or(self.pieceBB[Piece.WHITE], self.pieceBB[Piece.BLACK])
-        bishop_blockerboard = np.bitwise_and(self.generator.bishop_masks[square], occupiedBB)
-        rook_blockerboard = np.bitwise_and(self.generator.rook_masks[square], occupiedBB)
-
-        pawns = np.bitwise_and(self.pieceBB[opp_color], self.pieceBB[Piece.PAWN])
-        knight = np.bitwise_and(self.pieceBB[opp_color], self.pieceBB[Piece.KNIGHT])
-        bishop = np.bitwise_and(self.pieceBB[opp_color], self.pieceBB[Piece.BISHOP])
-        rook = np.bitwise_and(self.pieceBB[opp_color], self.pieceBB[Piece.ROOK])
-        queen = np.bitwise_and(self.pieceBB[opp_color], self.pieceBB[Piece.QUEEN])
-
-        pawn_attack = np.bitwise_and(self.generator.pawn_attacks[square][piece_color], pawns)
-        knight_attack = np.bitwise_and(self.generator.knight_moves[square], knight)
-        bishop_attack = np.bitwise_and(self.generator.bishop_moveboard[square][bishop_blockerboard], bishop)
-        rook_attack = np.bitwise_and(self.generator.rook_moveboard[square][rook_blockerboard], rook)
-        queen_attack = np.bitwise_or(self.generator.bishop_moveboard[square][bishop_blockerboard], self.generator.rook_moveboard[square][rook_blockerboard])
-        queen_attack = np.bitwise_and(queen_attack, queen)
-
-        pawn_knight = np.bitwise_or(pawn_attack, knight_attack) 
-        bishop_rook = np.bitwise_or(bishop_attack, rook_attack)
-
-        return np.bitwise_or(np.bitwise_or(pawn_knight, bishop_rook), queen_attack)
-
-    # Get a list of moves from a 64 bit moveboard
-    def get_moves_from_moveboard(self, moveboard, square_from, piece_color, piece_type, capture=False):
-        moves = []
-
+        occupiedBB = self.pieceBB[Piece.WHITE] | self.pieceBB[Piece.BLACK]
+        bishop_moves = self.generator.bishop_attacks(square, occupiedBB)
+        rook_moves = self.generator.rook_attacks(square, occupiedBB)
+
+        pawns = self.pieceBB[opp_color] & self.pieceBB[Piece.PAWN]
+        knight = self.pieceBB[opp_color] & self.pieceBB[Piece.KNIGHT]
+        bishop = self.pieceBB[opp_color] & self.pieceBB[Piece.BISHOP]
+        rook = self.pieceBB[opp_color] & self.pieceBB[Piece.ROOK]
+        queen = self.pieceBB[opp_color] & self.pieceBB[Piece.QUEEN]
+
+        pawn_attack = self.generator.pawn_attacks[square][piece_color] & pawns
+        knight_attack = self.generator.knight_moves[square] & knight
+        bishop_attack = bishop_moves & bishop
+        rook_attack = rook_moves & rook
+        queen_attack = bishop_moves | rook_moves
+        queen_attack = queen_attack & queen
+
+        pawn_knight = pawn_attack | knight_attack
+        bishop_rook = bishop_attack | rook_attack
+
+        return pawn_knight | bishop_rook | queen_attack
+
+    ## Number of pseudo legal moves of player_color, counted from attack bitboards ##
+    ## Pins, checks and castling are ignored and no moves are made ##
+    def mobility(self, player_color):
+        own_pieces = self.pieceBB[player_color]
+        opp_pieces = self.pieceBB[player_color ^ 1]
+        occupied_squares = own_pieces | opp_pieces
+        empty_squares = occupied_squares ^ BOARD_MASK
+        targets = own_pieces ^ BOARD_MASK
+
+        # Pawns are shifted together, each capture direction counted apart
+        pawns = own_pieces & self.pieceBB[Piece.PAWN]
+        if player_color == Piece.WHITE:
+            pushes = (pawns << 8) & empty_squares
+            double_pushes = ((pushes & THIRD_RANK) << 8) & empty_squares
+            west_captures = ((pawns & ~A_FILE) << 7) & opp_pieces
+            east_captures = ((pawns & ~H_FILE) << 9) & opp_pieces
+        else:
+            pushes = (pawns >> 8) & empty_squares
+            double_pushes = ((pushes & SIXTH_RANK) >> 8) & empty_squares
+            west_captures = ((pawns & ~A_FILE) >> 9) & opp_pieces
+            east_captures = ((pawns & ~H_FILE) >> 7) & opp_pieces
+        count = popcount(pushes) + popcount(double_pushes) + popcount(west_captures) + popcount(east_captures)
+
+        for i in iter_squares(own_pieces & self.pieceBB[Piece.KNIGHT]):
+            count = count + popcount(self.generator.knight_moves[i] & targets)
+        for i in iter_squares(own_pieces & (self.pieceBB[Piece.BISHOP] | self.pieceBB[Piece.QUEEN])):
+            count = count + popcount(self.generator.bishop_attacks(i, occupied_squares) & targets)
+        for i in iter_squares(own_pieces & (self.pieceBB[Piece.ROOK] | self.pieceBB[Piece.QUEEN])):
+            count = count + popcount(self.generator.rook_attacks(i, occupied_squares) & targets)
+        for i in iter_squares(own_pieces & self.pieceBB[Piece.KING]):
+            count = count + popcount(self.generator.king_moves[i] & targets)
+
+        return count
+
+    # Add the moves of a 64 bit moveboard to the move list
+    def get_moves_from_moveboard(self, moves, moveboard, square_from, piece_color, piece_type, capture=False):
         # If its pinned to king only allow moves in the pin line
         if square_from in self.pinned_pieces:
-            moveboard = np.bitwise_and(moveboard, self.pinned_pieces[square_from])
+            moveboard = moveboard & self.pinned_pieces[square_from]
 
         if capture:
-            opp_color = None
-            opp_color = Piece.BLACK if piece_color == Piece.WHITE else Piece.WHITE
-            while moveboard > 0:
-                square_to = self.generator.get_lsb(moveboard)
-                captured_piece = self.current_board[square_to][1]
-                move = Move(piece_color, piece_type, square_from, square_to, opp_color, captured_piece)
-                moves.append(move)
-                square_to = np.uint64(1) << np.uint64(square_to)
-                moveboard = np.bitwise_xor(moveboard, square_to)
+            for square_to in iter_squares(moveboard):
+                captured_piece = self.current_board[square_to] & PIECE_TYPE_MASK
+                moves.append(encode_move(piece_color, piece_type, square_from, square_to, captured_piece))
         else:
-            while moveboard > 0:
-                square_to = self.generator.get_lsb(moveboard)
-                move = Move(piece_color, piece_type, square_from, square_to)
-                moves.append(move)
-                square_to = np.uint64(1) << np.uint64(square_to)
-                moveboard = np.bitwise_xor(moveboard, square_to)
-
-        return moves
+            for square_to in iter_squares(moveboard):
+                moves.append(encode_move(piece_color, piece_type, square_from, square_to))
 
     # Get king legal moves
-    def get_king_legal(self, piece_color, square_from, opp_attacks):
-        moves = []
+    def get_king_legal(self, piece_color, square_from, moves, opp_attacks):
         opp_pieces = None
-        occupied_squares = np.bitwise_or(self.pieceBB[Piece.WHITE], self.pieceBB[Piece.BLACK])
+        occupied_squares = self.pieceBB[Piece.WHITE] | self.pieceBB[Piece.BLACK]
 
         #Set opposite color and check if it can castle either side
         if piece_color == Piece.WHITE:
             opp_pieces = self.pieceBB[Piece.BLACK]
             if self.castleA1:
                 castle_path = self.generator.ray_moves[square_from][Direction.WEST]
-                castle_path = np.bitwise_and(castle_path, occupied_squares)
-                if castle_path == np.uint64(1):
-                    move = Move(piece_color, Piece.KING, square_from, Square.C1, castle = True)
-                    moves.append(move)
+                castle_path = castle_path & occupied_squares
+                if castle_path == 1:
+                    moves.append(encode_move(piece_color, Piece.KING, square_from, Square.C1, castle = True))
             if self.castleH1:
                 castle_path = self.generator.ray_moves[square_from][Direction.EAST]
-                castle_path = np.bitwise_and(castle_path, occupied_squares)
-                if castle_path == np.uint64(128):
-                    move = Move(piece_color, Piece.KING, square_from, Square.G1, castle = True)
-                    moves.append(move)
+                castle_path = castle_path & occupied_squares
+                if castle_path == 128:
+                    moves.append(encode_move(piece_color, Piece.KING, square_from, Square.G1, castle = True))
         else:
             opp_pieces = self.pieceBB[Piece.WHITE]
             if self.castleA8:
                 castle_path = self.generator.ray_moves[square_from][Direction.WEST]
-                castle_path = np.bitwise_and(castle_path, occupied_squares)
-                if castle_path == np.uint64(72057594037927936):
-                    move = Move(piece_color, Piece.KING, square_from, Square.C8, castle = True)
-                    moves.append(move)
+                castle_path = castle_path & occupied_squares
+                if castle_path == 72057594037927936:
+                    moves.append(encode_move(piece_color, Piece.KING, square_from, Square.C8, castle = True))
             if self.castleH8:
                 castle_path = self.generator.ray_moves[square_from][Direction.EAST]
-                castle_path = np.bitwise_and(castle_path, occupied_squares)
-                if castle_path == np.uint64(9223372036854775808):
-                    move = Move(piece_color, Piece.KING, square_from, Square.G8, castle = True)
-                    moves.append(move)
+                castle_path = castle_path & occupied_squares
+                if castle_path == 9223372036854775808:
+                    moves.append(encode_move(piece_color, Piece.KING, square_from, Square.G8, castle = True))
 
         #Check for capture moves
-        legal_moves = np.bitwise_and(self.generator.king_moves[square_from], np.bitwise_not(opp_attacks))
-        capture_moves = np.bitwise_and(legal_moves, opp_pieces)
-        moves.extend(self.get_moves_from_moveboard(capture_moves, square_from, piece_color, Piece.KING, True))
+        legal_moves = self.generator.king_moves[square_from] & (opp_attacks ^ BOARD_MASK)
+        capture_moves = legal_moves & opp_pieces
+        self.get_moves_from_moveboard(moves, capture_moves, square_from, piece_color, Piece.KING, True)
 
         #Check for push moves
-        push_moves = np.bitwise_and(legal_moves, np.bitwise_not(occupied_squares))
-        moves.extend(self.get_moves_from_moveboard(push_moves, square_from, piece_color, Piece.KING))
-
-        return moves
+        push_moves = legal_moves & (occupied_squares ^ BOARD_MASK)
+        self.get_moves_from_moveboard(moves, push_moves, square_from, piece_color, Piece.KING)
 
     # Get pawn legal moves
-    def get_pawn_legal(self, piece_color, square_from, blocking_moves=np.uint64(18446744073709551615)):
-        moves = []
+    def get_pawn_legal(self, piece_color, square_from, moves, blocking_moves=BOARD_MASK):
         opp_pieces = None
 
         if piece_color == Piece.WHITE:
@@ -538,32 +645,29 @@ class Chess():
             opp_pieces = self.pieceBB[Piece.WHITE]
 
         # Check for capture moves
-        capture_moves = np.bitwise_and(self.generator.pawn_attacks[square_from][piece_color], opp_pieces)
-        capture_moves = np.bitwise_and(capture_moves, blocking_moves)
-        moves.extend(self.get_moves_from_moveboard(capture_moves, square_from, piece_color, Piece.PAWN, True))
+        capture_moves = self.generator.pawn_attacks[square_from][piece_color] & opp_pieces
+        capture_moves = capture_moves & blocking_moves
+        self.get_moves_from_moveboard(moves, capture_moves, square_from, piece_color, Piece.PAWN, True)
 
         # Check pawn blockers
-        occupied_squares = np.bitwise_or(self.pieceBB[Piece.WHITE], self.pieceBB[Piece.BLACK])
-        blocker_mask = np.bitwise_and(self.generator.pawn_pushes[square_from][piece_color], occupied_squares)
+        occupied_squares = self.pieceBB[Piece.WHITE] | self.pieceBB[Piece.BLACK]
+        blocker_mask = self.generator.pawn_pushes[square_from][piece_color] & occupied_squares
         blocker_square = None
         if blocker_mask > 0:
             if piece_color == Piece.WHITE:
-                blocker_square = self.generator.get_msb(blocker_mask)
+                blocker_square = get_msb(blocker_mask)
             else:
-                blocker_square = self.generator.get_lsb(blocker_mask)
-            blocker_mask = np.bitwise_or(self.generator.pawn_pushes[blocker_square][piece_color], blocker_mask)
+                blocker_square = get_lsb(blocker_mask)
+            blocker_mask = self.generator.pawn_pushes[blocker_square][piece_color] | blocker_mask
 
         # Check for push moves
-        push_moves = np.bitwise_and(blocker_mask, self.generator.pawn_pushes[square_from][piece_color])
-        push_moves = np.bitwise_xor(push_moves, self.generator.pawn_pushes[square_from][piece_color])
-        push_moves = np.bitwise_and(push_moves, blocking_moves)
-        moves.extend(self.get_moves_from_moveboard(push_moves, square_from, piece_color, Piece.PAWN))
-
-        return moves
+        push_moves = blocker_mask & self.generator.pawn_pushes[square_from][piece_color]
+        push_moves = push_moves ^ self.generator.pawn_pushes[square_from][piece_color]
+        push_moves = push_moves & blocking_moves
+        self.get_moves_from_moveboard(moves, push_moves, square_from, piece_color, Piece.PAWN)
 
     # Get knight legal moves from a square
-    def get_knight_legal(self, piece_color, square_from, blocking_moves=np.uint64(18446744073709551615)):
-        moves = []
+    def get_knight_legal(self, piece_color, square_from, moves, blocking_moves=BOARD_MASK):
         opp_pieces = None
 
         if piece_color == Piece.WHITE:
@@ -572,21 +676,18 @@ class Chess():
             opp_pieces = self.pieceBB[Piece.WHITE]
 
         ## Check for capture moves ##
-        capture_moves = np.bitwise_and(self.generator.knight_moves[square_from], opp_pieces)
-        capture_moves = np.bitwise_and(capture_moves, blocking_moves)
-        moves.extend(self.get_moves_from_moveboard(capture_moves, square_from, piece_color, Piece.KNIGHT, True))
+        capture_moves = self.generator.knight_moves[square_from] & opp_pieces
+        capture_moves = capture_moves & blocking_moves
+        self.get_moves_from_moveboard(moves, capture_moves, square_from, piece_color, Piece.KNIGHT, True)
 
         ## Check for push moves ##
-        occupied_squares = np.bitwise_not(np.bitwise_or(self.pieceBB[Piece.WHITE], self.pieceBB[Piece.BLACK]))
-        push_moves = np.bitwise_and(occupied_squares, self.generator.knight_moves[square_from]) 
-        push_moves = np.bitwise_and(push_moves, blocking_moves)
-        moves.extend(self.get_moves_from_moveboard(push_moves, square_from, piece_color, Piece.KNIGHT))
-        
-        return moves
+        occupied_squares = (self.pieceBB[Piece.WHITE] | self.pieceBB[Piece.BLACK]) ^ BOARD_MASK
+        push_moves = occupied_squares & self.generator.knight_moves[square_from]
+        push_moves = push_moves & blocking_moves
+        self.get_moves_from_moveboard(moves, push_moves, square_from, piece_color, Piece.KNIGHT)
 
     # Get bishop legal moves from a square
-    def get_sliding_legal(self, piece_color, square_from, piece_type, blocking_moves=np.uint64(18446744073709551615)):
-        moves = []
+    def get_sliding_legal(self, piece_color, square_from, moves, piece_type, blocking_moves=BOARD_MASK):
         opp_pieces = None
 
         if piece_color == Piece.WHITE:
@@ -596,39 +697,34 @@ class Chess():
             opp_pieces = self.pieceBB[Piece.WHITE]
             own_pieces = self.pieceBB[Piece.BLACK]
 
-        occupied_squares = np.bitwise_or(opp_pieces, own_pieces)
+        occupied_squares = opp_pieces | own_pieces
         moveboard = None
 
         if piece_type == Piece.BISHOP:
-            blockerboard = np.bitwise_and(occupied_squares, self.generator.bishop_masks[square_from])
-            moveboard = self.generator.bishop_moveboard[square_from][blockerboard]
+            moveboard = self.generator.bishop_attacks(square_from, occupied_squares)
         elif piece_type == Piece.ROOK:
-            blockerboard = np.bitwise_and(occupied_squares, self.generator.rook_masks[square_from])
-            moveboard = self.generator.rook_moveboard[square_from][blockerboard]
+            moveboard = self.generator.rook_attacks(square_from, occupied_squares)
         else:
-            blockerboard_bishop = np.bitwise_and(occupied_squares, self.generator.bishop_masks[square_from])
-            moveboard_bishop = self.generator.bishop_moveboard[square_from][blockerboard_bishop]
-            blockerboard_rook = np.bitwise_and(occupied_squares, self.generator.rook_masks[square_from])
-            moveboard_rook = self.generator.rook_moveboard[square_from][blockerboard_rook]
-            moveboard = np.bitwise_or(moveboard_bishop, moveboard_rook)
+            moveboard_bishop = self.generator.bishop_attacks(square_from, occupied_squares)
+            moveboard_rook = self.generator.rook_attacks(square_from, occupied_squares)
+            moveboard = moveboard_bishop | moveboard_rook
 
-        moveboard = np.bitwise_and(moveboard, np.bitwise_not(own_pieces))
+        moveboard = moveboard & (own_pieces ^ BOARD_MASK)
 
         # Check for capture moves ##
-        ignore_captures = np.bitwise_and(moveboard, opp_pieces)
-        capture_moves = np.bitwise_and(ignore_captures, blocking_moves)
-        moves.extend(self.get_moves_from_moveboard(capture_moves, square_from, piece_color, piece_type, True))
+        ignore_captures = moveboard & opp_pieces
+        capture_moves = ignore_captures & blocking_moves
+        self.get_moves_from_moveboard(moves, capture_moves, square_from, piece_color, piece_type, True)
 
         # Remove blocker and check for push moves ##
-        push_moves = np.bitwise_xor(moveboard, ignore_captures) 
-        push_moves = np.bitwise_and(push_moves, blocking_moves)
-        moves.extend(self.get_moves_from_moveboard(push_moves, square_from, piece_color, piece_type))
+        push_moves = moveboard ^ ignore_captures
+        push_moves = push_moves & blocking_moves
+        self.get_moves_from_moveboard(moves, push_moves, square_from, piece_color, piece_type)
 
-        return moves
     
     #Utility function to print uin64 number like board
     def draw_bitboard(self, bitboard):
-        bitboard = "{0:b}".format(bitboard).zfill(64)
+        bitboard = format(bitboard, "064b")
         for i in range(8):
             for j in range(8):
                 print(bitboard[(i*8 + 7-j)], end="")
@@ -1,112 +1,135 @@
 from engine.chess_logic import Chess, Piece
-import copy
+from engine.bitutils import get_lsb, popcount
+from engine.transposition import TranspositionTable, EXACT, LOWER, UPPER
+from engine.move_constants import NULL_MOVE, MOVE_SQUARE_MASK, MOVE_TO_SHIFT, MOVE_PIECE_SHIFT, MOVE_CAPTURE_SHIFT, MOVE_CAPTURE_MASK
+import engine.bitbase as bitbase
+import engine.psqt as psqt
+import time
+import multiprocessing
 import numpy as np
 
-class Minimax():
-    infinite = 20000
-    node_number = 0
-    pawn_value = np.array([
-        0,  0,  0,  0,  0,  0,  0,  0,
-        50, 50, 50, 50, 50, 50, 50, 50,
-        10, 10, 20, 30, 30, 20, 10, 10,
-        5,  5, 10, 25, 25, 10,  5,  5,
-        0,  0,  0, 20, 20,  0,  0,  0,
-        5, -5,-10,  0,  0,-10, -5,  5,
-        5, 10, 10,-20,-20, 10, 10,  5,
-        0,  0,  0,  0,  0,  0,  0,  0
-    ])
-    knight_value = np.array([
-        -50,-40,-30,-30,-30,-30,-40,-50,
-        -40,-20,  0,  0,  0,  0,-20,-40,
-        -30,  0, 10, 15, 15, 10,  0,-30,
-        -30,  5, 15, 20, 20, 15,  5,-30,
-        -30,  0, 15, 20, 20, 15,  0,-30,
-        -30,  5, 10, 15, 15, 10,  5,-30,
-        -40,-20,  0,  5,  5,  0,-20,-40,
-        -50,-40,-30,-30,-30,-30,-40,-50
-    ])
-    bishop_value = np.array([
-        -20,-10,-10,-10,-10,-10,-10,-20,
-        -10,  0,  0,  0,  0,  0,  0,-10,
-        -10,  0,  5, 10, 10,  5,  0,-10,
-        -10,  5,  5, 10, 10,  5,  5,-10,
-        -10,  0, 10, 10, 10, 10,  0,-10,
-        -10, 10, 10, 10, 10, 10, 10,-10,
-        -10,  5,  0,  0,  0,  0,  5,-10,
-        -20,-10,-10,-10,-10,-10,-10,-20
-    ])
-    rook_value = np.array([
-        0,  0,  0,  0,  0,  0,  0,  0,
-        5, 10, 10, 10, 10, 10, 10,  5,
-        -5,  0,  0,  0,  0,  0,  0, -5,
-        -5,  0,  0,  0,  0,  0,  0, -5,
-        -5,  0,  0,  0,  0,  0,  0, -5,
-        -5,  0,  0,  0,  0,  0,  0, -5,
-        -5,  0,  0,  0,  0,  0,  0, -5,
-        0,  0,  0,  5,  5,  0,  0,  0
-    ])
-    queen_value = np.array([
-        -20,-10,-10, -5, -5,-10,-10,-20,
-        -10,  0,  0,  0,  0,  0,  0,-10,
-        -10,  0,  5,  5,  5,  5,  0,-10,
-        -5,  0,  5,  5,  5,  5,  0, -5,
-        0,  0,  5,  5,  5,  5,  0, -5,
-        -10,  5,  5,  5,  5,  5,  0,-10,
-        -10,  0,  5,  0,  0,  0,  0,-10,
-        -20,-10,-10, -5, -5,-10,-10,-20
-    ])
-    king_value_middlegame = np.array([
-        -30,-40,-40,-50,-50,-40,-40,-30,
-        -30,-40,-40,-50,-50,-40,-40,-30,
-        -30,-40,-40,-50,-50,-40,-40,-30,
-        -30,-40,-40,-50,-50,-40,-40,-30,
-        -20,-30,-30,-40,-40,-30,-30,-20,
-        -10,-20,-20,-20,-20,-20,-20,-10,
-        20, 20,  0,  0,  0,  0, 20, 20,
-        20, 30, 10,  0,  0, 10, 30, 20
-    ])
+# Raised inside the search when a limit is reached
+class SearchStopped(Exception):
+    pass
 
-    def evaluate(cb):
-        w_moves_size = len(cb.get_legal_moves(Piece.WHITE))
-        b_moves_size = len(cb.get_legal_moves(Piece.BLACK))
+# Selective search settings of negamax
+class SearchOptions():
+    def __init__(self, null_move=True, null_move_reduction=2, null_move_min_depth=3,
+                 late_move_reduction=True, lmr_min_depth=3, lmr_full_moves=3, lmr_reduction=1):
+        # Skip a turn and search shallower, if the opponent still can't reach
+        # beta the node is cut. Never used in check or with only pawns left
+        self.null_move = null_move
+        self.null_move_reduction = null_move_reduction
+        self.null_move_min_depth = null_move_min_depth
+        # Quiet moves ordered after the first lmr_full_moves are searched
+        # lmr_reduction plies shallower first, and again fully if they raise alpha
+        self.late_move_reduction = late_move_reduction
+        self.lmr_min_depth = lmr_min_depth
+        self.lmr_full_moves = lmr_full_moves
+        self.lmr_reduction = lmr_reduction
+
+        if null_move_reduction < 0 or lmr_reduction < 0 or lmr_full_moves < 0:
+            raise ValueError("reductions and lmr_full_moves can't be negative")
+        if null_move_min_depth < 1 or lmr_min_depth < 1:
+            raise ValueError("null_move_min_depth and lmr_min_depth must be at least 1")
+
+# Counters of one search, nodes include the quiescence ones
+class SearchStats():
+    def __init__(self):
+        self.nodes = 0
+        self.qnodes = 0
+        self.cutoffs = 0
+        # Cutoffs made by the first move searched, high with good move ordering
+        self.first_move_cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        # Last completed depth and the deepest ply reached
+        self.depth = 0
+        self.seldepth = 0
+        self.start = time.perf_counter()
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
 
-        w_queens = "{0:b}".format(np.bitwise_and(cb.pieceBB[Piece.WHITE], cb.pieceBB[Piece.QUEEN])).zfill(64)
-        b_queens = "{0:b}".format(np.bitwise_and(cb.pieceBB[Piece.BLACK], cb.pieceBB[Piece.QUEEN])).zfill(64)
+    def nps(self):
+        elapsed = self.elapsed()
+        return self.nodes / elapsed if elapsed > 0 else 0
 
-        w_rooks = "{0:b}".format(np.bitwise_and(cb.pieceBB[Piece.WHITE], cb.pieceBB[Piece.ROOK])).zfill(64)
-        b_rooks = "{0:b}".format(np.bitwise_and(cb.pieceBB[Piece.BLACK], cb.pieceBB[Piece.ROOK])).zfill(64)
-        
-        w_bishops = "{0:b}".format(np.bitwise_and(cb.pieceBB[Piece.WHITE], cb.pieceBB[Piece.BISHOP])).zfill(64)
-        b_bishops = "{0:b}".format(np.bitwise_and(cb.pieceBB[Piece.BLACK], cb.pieceBB[Piece.BISHOP])).zfill(64)
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0
 
-        w_knights = "{0:b}".format(np.bitwise_and(cb.pieceBB[Piece.WHITE], cb.pieceBB[Piece.KNIGHT])).zfill(64)
-        b_knights = "{0:b}".format(np.bitwise_and(cb.pieceBB[Piece.BLACK], cb.pieceBB[Piece.KNIGHT])).zfill(64)
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0
 
-        w_pawns = "{0:b}".format(np.bitwise_and(cb.pieceBB[Piece.WHITE], cb.pieceBB[Piece.PAWN])).zfill(64)
-        b_pawns = "{0:b}".format(np.bitwise_and(cb.pieceBB[Piece.BLACK], cb.pieceBB[Piece.PAWN])).zfill(64)
+    def __repr__(self):
+        return ("SearchStats(depth=%d, seldepth=%d, nodes=%d, qnodes=%d, nps=%d, cutoffs=%d, first_move=%.2f, tt_hits=%.2f, time=%.3f)"
+                % (self.depth, self.seldepth, self.nodes, self.qnodes, self.nps(), self.cutoffs,
+                   self.first_move_cutoff_rate(), self.tt_hit_rate(), self.elapsed()))
 
-        w_pawn_score = Minimax.pawn_value * np.array([int(x) for x in w_pawns])
-        b_pawn_score = list(reversed(Minimax.pawn_value)) * np.array([int(x) for x in b_pawns])
+# Result of the deepest fully searched iteration
+class SearchResult():
+    def __init__(self, best_move, score, pv, depth, nodes, elapsed, stats=None):
+        self.best_move = best_move
+        self.score = score
+        self.pv = pv
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.stats = stats
 
-        w_knight_score = Minimax.knight_value * np.array([int(x) for x in w_knights])
-        b_knight_score = list(reversed(Minimax.knight_value)) * np.array([int(x) for x in b_knights])
+    def __repr__(self):
+        return "SearchResult(best_move=%s, score=%s, depth=%d, nodes=%d)" % (self.best_move, self.score, self.depth, self.nodes)
 
-        w_bishop_score = Minimax.bishop_value * np.array([int(x) for x in w_bishops])
-        b_bishop_score = list(reversed(Minimax.bishop_value)) * np.array([int(x) for x in b_bishops])
+class Minimax():
+    infinite = 20000
+    # Statistics of the running or last search
+    stats = SearchStats()
+    # Limits of the running search, checked every check_interval nodes
+    check_interval = 64
+    stop_time = None
+    node_limit = None
+    stop_flag = None
+    # Called with the stats every progress_interval seconds and after each depth
+    progress = None
+    progress_interval = 1.0
+    next_progress = None
+    can_stop = False
+    root_best_move = 0
+    options = SearchOptions()
+    # Captures are searched past the horizon until the position is quiet.
+    # Captures that can't bring the score back to alpha even with delta_margin
+    # centipawns more than the captured piece are skipped
+    use_quiescence = True
+    delta_pruning = True
+    delta_margin = 200
+    # Centipawn value of each piece type, the same evaluate counts
+    material_values = psqt.material_values
+    # Iterations after the first search a window of this many centipawns
+    # around the last score, widened on a fail high or low
+    aspiration_window = 50
+    # King and pawn or rook against king positions are scored exactly from
+    # the bitbases below the root, once bitbase.get_bitbases has built them.
+    # Wins are worth bitbase_score, more with the lone king near the edge and
+    # the kings close so the search makes progress towards mate, and are
+    # searched until the horizon for one
+    use_bitbases = True
+    bitbase_score = 10000
 
-        w_rook_score = Minimax.rook_value * np.array([int(x) for x in w_rooks])
-        b_rook_score = list(reversed(Minimax.rook_value)) * np.array([int(x) for x in b_rooks])
+    # Centipawns of each pseudo legal move in the middlegame and the endgame
+    mobility_middlegame = 10
+    mobility_endgame = 10
 
-        w_queen_score = Minimax.queen_value * np.array([int(x) for x in w_queens])
-        b_queen_score = list(reversed(Minimax.queen_value)) * np.array([int(x) for x in b_queens])
+    # Material and piece square tables are kept up to date by Chess in
+    # psqt_middlegame and psqt_endgame, only mobility is counted here and
+    # both are blended by the game phase. Mobility comes from attack
+    # bitboards so the board isn't touched, game_over has to be set by
+    # generating the moves of the side to move first
+    def evaluate(cb):
+        mobility = cb.mobility(Piece.WHITE) - cb.mobility(Piece.BLACK)
+        middlegame = cb.psqt_middlegame + Minimax.mobility_middlegame*mobility
+        endgame = cb.psqt_endgame + Minimax.mobility_endgame*mobility
 
-        evaluation = 1000*(w_queens.count("1")-b_queens.count("1")) + 525*(w_rooks.count("1")-b_rooks.count("1")) + 350*(w_bishops.count("1")-b_bishops.count("1")) + 350*(w_knights.count("1")-b_knights.count("1")) + (w_pawns.count("1")-b_pawns.count("1"))
-        evaluation = evaluation + 10*(w_moves_size - b_moves_size)
-        evaluation = evaluation + (np.sum(w_pawn_score) - np.sum(b_pawn_score))
-        evaluation = evaluation + (np.sum(w_knight_score) - np.sum(b_knight_score))
-        evaluation = evaluation + (np.sum(w_bishop_score) - np.sum(b_bishop_score))
-        evaluation = evaluation + (np.sum(w_rook_score) - np.sum(b_rook_score))
-        evaluation = evaluation + (np.sum(w_queen_score) - np.sum(b_queen_score))
+        evaluation = psqt.taper(middlegame, endgame, cb.phase)
 
         if cb.game_over: 
             evaluation = Minimax.infinite if cb.player_turn == Piece.BLACK else -Minimax.infinite
@@ -115,32 +138,616 @@ class Minimax():
 
         return evaluation
 
-    def searchABPruning(cb, depth, alpha=-infinite, beta=infinite):
-        Minimax.node_number = Minimax.node_number + 1
-        print("Alpha Beta Pruning number of nodes: %d\r"%Minimax.node_number, end="")
-        if depth == 0 or cb.game_over: return Minimax.evaluate(cb)
+    # Tapered material and piece square terms of evaluate for an Nx8 uint64 array of
+    # pieceBB boards, in pawns for white like evaluate whoever is to move.
+    # side_to_move, 0 for white and 1 for black on each board, is only used
+    # with relative, which gives the scores for the side to move instead
+    def evaluate_batch(boards, side_to_move=None, relative=False):
+        scores = psqt.score_boards(boards) / 100
+        if relative:
+            if side_to_move is None:
+                raise ValueError("relative scores need side_to_move")
+            scores = np.where(np.asarray(side_to_move) == Piece.BLACK, -scores, scores)
+        return scores
+
+    # Transposition table shared by every search, built on first use
+    table_size_mb = 16
+    transposition_table = None
+
+    def get_transposition_table():
+        if Minimax.transposition_table is None:
+            Minimax.transposition_table = TranspositionTable(Minimax.table_size_mb)
+        return Minimax.transposition_table
+
+    # Replace the table with an empty one of size_mb megabytes
+    def set_table_size(size_mb):
+        Minimax.table_size_mb = size_mb
+        Minimax.transposition_table = TranspositionTable(size_mb)
+
+    # Move ordering: the table move first, then captures by most valuable
+    # victim and least valuable attacker, then the killer moves of the ply,
+    # then quiet moves by how often they caused a cutoff
+    table_move_order = 1 << 30
+    capture_order = 1 << 29
+    killer_order = 1 << 28
+    killer_moves = []
+    history_table = [[[0]*64 for i in range(64)] for color in range(2)]
+
+    def clear_move_order():
+        Minimax.killer_moves = []
+        Minimax.history_table = [[[0]*64 for i in range(64)] for color in range(2)]
+
+    def order_moves(cb, move_list, table_move, ply):
+        while len(Minimax.killer_moves) <= ply:
+            Minimax.killer_moves.append([0, 0])
+        killers = Minimax.killer_moves[ply]
+        history = Minimax.history_table[cb.player_turn]
+
+        def move_order(move):
+            if move == table_move:
+                return Minimax.table_move_order
+            victim = (move >> MOVE_CAPTURE_SHIFT) & 7
+            if victim:
+                attacker = (move >> MOVE_PIECE_SHIFT) & 7
+                return Minimax.capture_order + (victim << 3) - attacker
+            if move == killers[0] or move == killers[1]:
+                return Minimax.killer_order
+            return history[move & MOVE_SQUARE_MASK][(move >> MOVE_TO_SHIFT) & MOVE_SQUARE_MASK]
+
+        move_list.sort(key=move_order, reverse=True)
+
+    # A beta cutoff by the move at index of the ordered list
+    def count_cutoff(index):
+        stats = Minimax.stats
+        stats.cutoffs = stats.cutoffs + 1
+        if index == 0:
+            stats.first_move_cutoffs = stats.first_move_cutoffs + 1
+
+    # Remember a quiet move that caused a cutoff, captures are already tried early
+    def store_cutoff(cb, move, depth, ply):
+        if move & MOVE_CAPTURE_MASK:
+            return
+
+        killers = Minimax.killer_moves[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+
+        history = Minimax.history_table[cb.player_turn]
+        square_from = move & MOVE_SQUARE_MASK
+        square_to = (move >> MOVE_TO_SHIFT) & MOVE_SQUARE_MASK
+        history[square_from][square_to] = history[square_from][square_to] + depth * depth
+
+    # Opening book searched before every search, see engine.book
+    book = None
+
+    # Iterative deepening up to max_depth. Stops early once time_limit seconds
+    # or node_limit nodes are used or stop_flag (a threading or multiprocessing
+    # Event) is set, returning the result of the last completed depth
+    # With workers above 1 helper processes search the same position and
+    # share the transposition table, see parallel_search
+    # progress is called with the SearchStats while searching
+    def search(cb, max_depth=64, time_limit=None, node_limit=None, stop_flag=None, options=None, workers=1, start_depth=1,
+               progress=None, progress_interval=1.0):
+        # Book moves are played without searching, the result has depth 0
+        if Minimax.book is not None:
+            move = Minimax.book.choose_move(cb)
+            if move:
+                return SearchResult(move, 0, [move], 0, 0, 0, SearchStats())
+
+        if workers > 1:
+            return Minimax.parallel_search(cb, workers, max_depth, time_limit, node_limit, stop_flag, options,
+                                           progress, progress_interval)
+
+        stats = SearchStats()
+        Minimax.stats = stats
+        # Options only hold for this search, the defaults are put back after
+        default_options = Minimax.options
+        if options is not None:
+            Minimax.options = options
+        try:
+            return Minimax.iterative_deepening(cb, stats, max_depth, time_limit, node_limit, stop_flag, start_depth,
+                                               progress, progress_interval)
+        finally:
+            Minimax.options = default_options
+            Minimax.can_stop = False
+            Minimax.progress = None
+
+    # Body of search once the options are set
+    def iterative_deepening(cb, stats, max_depth, time_limit, node_limit, stop_flag, start_depth, progress,
+                            progress_interval):
+        start = stats.start
+        Minimax.stop_time = start + time_limit if time_limit is not None else None
+        Minimax.node_limit = node_limit
+        Minimax.stop_flag = stop_flag
+        Minimax.progress = progress
+        Minimax.progress_interval = progress_interval
+        Minimax.next_progress = start + progress_interval
+        Minimax.root_best_move = 0
+        Minimax.clear_move_order()
+        history_size = len(cb.move_history)
+        result = None
+
+        for depth in range(start_depth, max_depth + 1):
+            # The first iteration always finishes so there is a move to return
+            Minimax.can_stop = result is not None
+            try:
+                score = Minimax.aspiration_search(cb, depth, result)
+            except SearchStopped:
+                while len(cb.move_history) > history_size:
+                    cb.unmove()
+                break
+
+            pv = Minimax.get_pv(cb, depth)
+            best_move = pv[0] if pv else Minimax.root_best_move
+            stats.depth = depth
+            result = SearchResult(best_move, score, pv, depth, stats.nodes, time.perf_counter() - start, stats)
+            if progress is not None:
+                progress(stats)
+
+            # No legal moves or a forced mate, deeper searches won't change it
+            if not best_move or abs(score) >= Minimax.infinite / 100:
+                break
+
+        return result
+
+    # Lazy SMP: helper processes run their own iterative deepening on the same
+    # position, half of them skipping the first depth, and all of them read and
+    # write one transposition table in shared memory. The result comes from
+    # this process, helpers are stopped when it finishes
+    def parallel_search(cb, workers, max_depth=64, time_limit=None, node_limit=None, stop_flag=None, options=None,
+                        progress=None, progress_interval=1.0):
+        if options is None:
+            options = Minimax.options
+        table = TranspositionTable(Minimax.table_size_mb, shared=True)
+        stop_event = multiprocessing.Event()
+        helper_nodes = multiprocessing.Array('q', workers - 1, lock=False)
+        helpers = []
+        for i in range(workers - 1):
+            helper = multiprocessing.Process(target=search_worker, daemon=True,
+                                             args=(cb.get_fen_position(), table.name, Minimax.table_size_mb, max_depth,
+                                                   options, stop_event, helper_nodes, i))
+            helper.start()
+            helpers.append(helper)
+
+        private_table = Minimax.transposition_table
+        Minimax.transposition_table = table
+        try:
+            result = Minimax.search(cb, max_depth, time_limit, node_limit, stop_flag, options,
+                                    progress=progress, progress_interval=progress_interval)
+        finally:
+            stop_event.set()
+            for helper in helpers:
+                helper.join(1)
+                if helper.is_alive():
+                    helper.terminate()
+            Minimax.transposition_table = private_table
+            table.close()
+
+        # No result if no depth was searched. Helper nodes count towards the
+        # totals and the nps of the stats
+        if result is not None:
+            nodes = sum(helper_nodes)
+            result.nodes = result.nodes + nodes
+            result.stats.nodes = result.stats.nodes + nodes
+        return result
+
+    # Search the root with a window around the previous score, returns the
+    # score for white in pawns like searchABPruning
+    def aspiration_search(cb, depth, previous):
+        sign = 1 if cb.player_turn == Piece.WHITE else -1
+        full_window = Minimax.infinite + 1
+        alpha = -full_window
+        beta = full_window
+        window = Minimax.aspiration_window
+        if previous is not None and window:
+            previous_score = round(previous.score * 100) * sign
+            alpha = max(previous_score - window, -full_window)
+            beta = min(previous_score + window, full_window)
+
+        while True:
+            score = Minimax.negamax(cb, depth, alpha, beta)
+            if score <= alpha and alpha > -full_window:
+                alpha = max(score - window, -full_window)
+            elif score >= beta and beta < full_window:
+                beta = min(score + window, full_window)
+            else:
+                return score * sign / 100
+            window = window * 2
+
+    # Follow the best moves stored in the transposition table
+    def get_pv(cb, max_length):
+        table = Minimax.get_transposition_table()
+        pv = []
+        if Minimax.root_best_move:
+            pv.append(Minimax.root_best_move)
+            cb.make_move(Minimax.root_best_move)
+
+        while 0 < len(pv) < max_length:
+            entry = table.probe(cb.hash_key)
+            if entry is None or entry[3] not in cb.generate_legal_moves(cb.player_turn):
+                break
+            pv.append(entry[3])
+            cb.make_move(entry[3])
+
+        for move in pv:
+            cb.unmove()
+
+        return pv
+
+    def check_limits():
+        if Minimax.progress is not None and time.perf_counter() >= Minimax.next_progress:
+            Minimax.next_progress = time.perf_counter() + Minimax.progress_interval
+            Minimax.progress(Minimax.stats)
+        if not Minimax.can_stop:
+            return
+        if Minimax.stop_time is not None and time.perf_counter() >= Minimax.stop_time:
+            raise SearchStopped()
+        if Minimax.node_limit is not None and Minimax.stats.nodes >= Minimax.node_limit:
+            raise SearchStopped()
+        if Minimax.stop_flag is not None and Minimax.stop_flag.is_set():
+            raise SearchStopped()
+
+    # Negamax form of searchABPruning with principal variation search. Scores
+    # are ints in centipawns for the side to move, the table keeps them for white
+    def negamax(cb, depth, alpha, beta, ply=0):
+        stats = Minimax.stats
+        stats.nodes = stats.nodes + 1
+        if stats.nodes % Minimax.check_interval == 0:
+            Minimax.check_limits()
+        if ply > stats.seldepth:
+            stats.seldepth = ply
+
+        sign = 1 if cb.player_turn == Piece.WHITE else -1
+        table = Minimax.get_transposition_table()
+        if ply == 0:
+            table.new_search()
+
+        table_move = 0
+        entry = table.probe(cb.hash_key)
+        stats.tt_probes = stats.tt_probes + 1
+        if entry is not None:
+            stats.tt_hits = stats.tt_hits + 1
+            entry_depth, bound, score, table_move = entry
+            if entry_depth >= depth and ply > 0:
+                score = score * sign
+                if sign < 0 and bound != EXACT:
+                    bound = LOWER if bound == UPPER else UPPER
+                if bound == EXACT:
+                    return score
+                elif bound == LOWER and score >= beta:
+                    return score
+                elif bound == UPPER and score <= alpha:
+                    return score
+
+        if Minimax.use_bitbases and ply > 0:
+            result = bitbase.probe(cb)
+            # Draws are final, won and lost positions are still searched for mate
+            if result == bitbase.DRAW or (result is not None and depth <= 0):
+                return Minimax.bitbase_result(cb, result, ply)
+
+        alpha_start = alpha
+        if depth <= 0 and not cb.game_over and Minimax.use_quiescence:
+            best_score = Minimax.qsearch(cb, alpha, beta, ply)
+            best_move = 0
+            depth = 0
+        elif depth <= 0 or cb.game_over:
+            cb.generate_legal_moves(cb.player_turn, ply)
+            evaluation = round(Minimax.evaluate(cb) * 100)
+            table.store(cb.hash_key, 0, EXACT, evaluation, 0)
+            return evaluation * sign
+        else:
+            options = Minimax.options
+            in_check = cb.is_in_check(cb.player_turn)
+
+            # Null move pruning, only in zero window nodes
+            if (options.null_move and ply > 0 and depth >= options.null_move_min_depth
+                    and beta - alpha == 1 and not in_check and cb.move_history[-1] != NULL_MOVE
+                    and Minimax.has_pieces(cb, cb.player_turn)):
+                cb.make_null_move()
+                # Reductions never go below the horizon
+                reduced_depth = max(0, depth - 1 - options.null_move_reduction)
+                score = -Minimax.negamax(cb, reduced_depth, -beta, -beta + 1, ply + 1)
+                cb.unmove()
+                if score >= beta:
+                    return beta
+
+            best_score = -Minimax.infinite
+            best_move = 0
+            move_list = cb.generate_legal_moves(cb.player_turn, ply)
+            Minimax.order_moves(cb, move_list, table_move, ply)
+            killers = Minimax.killer_moves[ply]
+            moves_searched = 0
+            for move in move_list:
+                cb.make_move(move)
+                # Moves after the first are only proven worse with a zero window,
+                # they are searched again with the full one if that fails
+                if not best_move:
+                    score = -Minimax.negamax(cb, depth - 1, -beta, -alpha, ply + 1)
+                else:
+                    reduction = 0
+                    if (options.late_move_reduction and depth >= options.lmr_min_depth
+                            and moves_searched >= options.lmr_full_moves and not in_check
+                            and not move & MOVE_CAPTURE_MASK and move != killers[0] and move != killers[1]):
+                        reduction = options.lmr_reduction
+                    score = -Minimax.negamax(cb, max(0, depth - 1 - reduction), -alpha - 1, -alpha, ply + 1)
+                    if reduction and score > alpha:
+                        score = -Minimax.negamax(cb, depth - 1, -alpha - 1, -alpha, ply + 1)
+                    if alpha < score < beta:
+                        score = -Minimax.negamax(cb, depth - 1, -beta, -alpha, ply + 1)
+                cb.unmove()
+                moves_searched = moves_searched + 1
+
+                if score > best_score or not best_move:
+                    best_score = score
+                    best_move = move
+                if score > alpha:
+                    alpha = score
+                if alpha >= beta:
+                    Minimax.count_cutoff(moves_searched - 1)
+                    Minimax.store_cutoff(cb, move, depth, ply)
+                    break
+
+        if best_score <= alpha_start:
+            bound = UPPER
+        elif best_score >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        if sign < 0 and bound != EXACT:
+            bound = LOWER if bound == UPPER else UPPER
+        table.store(cb.hash_key, depth, bound, best_score * sign, best_move)
+        if ply == 0:
+            Minimax.root_best_move = best_move
+
+        return best_score
+
+    # Score of a bitbase result for the side to move, a lost position without
+    # moves is mate like evaluate scores it
+    def bitbase_result(cb, result, ply):
+        if result == bitbase.DRAW:
+            return 0
+        if result == bitbase.LOSS and not cb.generate_legal_moves(cb.player_turn, ply):
+            return -Minimax.infinite
+
+        weak = Piece.WHITE if popcount(cb.pieceBB[Piece.WHITE]) == 1 else Piece.BLACK
+        weak_king = get_lsb(cb.pieceBB[weak])
+        strong_king = get_lsb(cb.pieceBB[weak ^ 1] & cb.pieceBB[Piece.KING])
+        file = weak_king & 7
+        rank = weak_king >> 3
+        edge = max(3 - file, file - 4) + max(3 - rank, rank - 4)
+        distance = max(abs(file - (strong_king & 7)), abs(rank - (strong_king >> 3)))
+        score = Minimax.bitbase_score + 10 * edge + 10 * (7 - distance) - ply
+        # The rook boxes the king in on its side of the rook's file and rank
+        rooks = cb.pieceBB[Piece.ROOK]
+        if rooks:
+            rook = get_lsb(rooks)
+            files = Minimax.box_size(file, rook & 7)
+            ranks = Minimax.box_size(rank, rook >> 3)
+            score = score + 4 * (64 - files * ranks)
+
+        return score if result == bitbase.WIN else -score
+
+    # Files or ranks left to the king on its side of the rook
+    def box_size(king, rook):
+        if king > rook:
+            return 7 - rook
+        if king < rook:
+            return rook
+        return 8
+
+    # Side has something besides king and pawns, null moves are unsafe without
+    # since zugzwang is common there
+    def has_pieces(cb, player_color):
+        pawns_kings = cb.pieceBB[Piece.PAWN] | cb.pieceBB[Piece.KING]
+        return cb.pieceBB[player_color] & ~pawns_kings != 0
+
+    # Negamax form of quiescence, in centipawns for the side to move
+    def qsearch(cb, alpha, beta, ply):
+        stats = Minimax.stats
+        stats.nodes = stats.nodes + 1
+        stats.qnodes = stats.qnodes + 1
+        if stats.nodes % Minimax.check_interval == 0:
+            Minimax.check_limits()
+        if ply > stats.seldepth:
+            stats.seldepth = ply
+
+        # Moves are generated first so evaluate sees mate and stalemate
+        move_list = cb.generate_legal_moves(cb.player_turn, ply)
+        sign = 1 if cb.player_turn == Piece.WHITE else -1
+        stand_pat = round(Minimax.evaluate(cb) * 100) * sign
+        if cb.game_over or stand_pat >= beta:
+            return stand_pat
+
+        alpha = max(alpha, stand_pat)
+        best_score = stand_pat
+        Minimax.order_moves(cb, move_list, 0, ply)
+        for move in move_list:
+            # Captures are ordered first
+            if not move & MOVE_CAPTURE_MASK:
+                break
+            if Minimax.delta_pruning:
+                gain = Minimax.material_values[(move >> MOVE_CAPTURE_SHIFT) & 7] + Minimax.delta_margin
+                # The skipped capture could still score up to stand_pat + gain
+                if stand_pat + gain <= alpha:
+                    best_score = max(best_score, stand_pat + gain)
+                    continue
+            cb.make_move(move)
+            score = -Minimax.qsearch(cb, -beta, -alpha, ply + 1)
+            cb.unmove()
+            if score > best_score:
+                best_score = score
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        return best_score
+
+    # Search only captures, the side to move can also stand pat on the evaluation
+    def quiescence(cb, alpha, beta, ply):
+        stats = Minimax.stats
+        stats.nodes = stats.nodes + 1
+        stats.qnodes = stats.qnodes + 1
+        if stats.nodes % Minimax.check_interval == 0:
+            Minimax.check_limits()
+        if ply > stats.seldepth:
+            stats.seldepth = ply
+
+        move_list = cb.generate_legal_moves(cb.player_turn, ply)
+        stand_pat = Minimax.evaluate(cb)
+        if cb.game_over:
+            return stand_pat
 
         if cb.player_turn == Piece.WHITE:
-            maxEval = -Minimax.infinite
-            move_list = cb.get_legal_moves(cb.player_turn)
-            og_position = cb.get_fen_position()
+            if stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+            maxEval = stand_pat
+            Minimax.order_moves(cb, move_list, 0, ply)
             for move in move_list:
-                cb.move(move)
-                maxEval = max(maxEval, Minimax.searchABPruning(cb, depth - 1, alpha, beta))
+                # Captures are ordered first
+                if not move & MOVE_CAPTURE_MASK:
+                    break
+                if Minimax.delta_pruning:
+                    gain = Minimax.material_values[(move >> MOVE_CAPTURE_SHIFT) & 7] + Minimax.delta_margin
+                    # The skipped capture could still score up to stand_pat + gain
+                    if stand_pat + gain / 100 <= alpha:
+                        maxEval = max(maxEval, stand_pat + gain / 100)
+                        continue
+                cb.make_move(move)
+                maxEval = max(maxEval, Minimax.quiescence(cb, alpha, beta, ply + 1))
                 alpha = max(alpha, maxEval)
-                cb.load_fen_position(og_position)
+                cb.unmove()
                 if alpha >= beta:
                     break
-            return maxEval 
+            return maxEval
         else:
-            minEval = Minimax.infinite
-            move_list = cb.get_legal_moves(cb.player_turn)
-            og_position = cb.get_fen_position()
+            if stand_pat <= alpha:
+                return stand_pat
+            beta = min(beta, stand_pat)
+            minEval = stand_pat
+            Minimax.order_moves(cb, move_list, 0, ply)
             for move in move_list:
-                cb.move(move)
-                minEval = min(minEval, Minimax.searchABPruning(cb, depth - 1, alpha, beta))
+                if not move & MOVE_CAPTURE_MASK:
+                    break
+                if Minimax.delta_pruning:
+                    gain = Minimax.material_values[(move >> MOVE_CAPTURE_SHIFT) & 7] + Minimax.delta_margin
+                    if stand_pat - gain / 100 >= beta:
+                        minEval = min(minEval, stand_pat - gain / 100)
+                        continue
+                cb.make_move(move)
+                minEval = min(minEval, Minimax.quiescence(cb, alpha, beta, ply + 1))
                 beta = min(beta, minEval)
-                cb.load_fen_position(og_position)
+                cb.unmove()
                 if beta <= alpha:
                     break
             return minEval
+
+    # Plain alpha beta with white maximizing and black minimizing, kept as the
+    # reference for negamax
+    def searchABPruning(cb, depth, alpha=-infinite, beta=infinite, ply=0):
+        stats = Minimax.stats
+        stats.nodes = stats.nodes + 1
+        if stats.nodes % Minimax.check_interval == 0:
+            Minimax.check_limits()
+        if ply > stats.seldepth:
+            stats.seldepth = ply
+
+        table = Minimax.get_transposition_table()
+        if ply == 0:
+            table.new_search()
+
+        # Scores are kept in the table as ints
+        table_move = 0
+        entry = table.probe(cb.hash_key)
+        stats.tt_probes = stats.tt_probes + 1
+        if entry is not None:
+            stats.tt_hits = stats.tt_hits + 1
+            entry_depth, bound, score, table_move = entry
+            score = score / 100
+            if entry_depth >= depth and ply > 0:
+                if bound == EXACT:
+                    return score
+                elif bound == LOWER and score >= beta:
+                    return score
+                elif bound == UPPER and score <= alpha:
+                    return score
+
+        if depth == 0 and not cb.game_over and Minimax.use_quiescence:
+            evaluation = Minimax.quiescence(cb, alpha, beta, ply)
+            if evaluation <= alpha:
+                bound = UPPER
+            elif evaluation >= beta:
+                bound = LOWER
+            else:
+                bound = EXACT
+            table.store(cb.hash_key, 0, bound, round(evaluation * 100), 0)
+            return evaluation
+        elif depth == 0 or cb.game_over:
+            cb.generate_legal_moves(cb.player_turn, ply)
+            evaluation = Minimax.evaluate(cb)
+            table.store(cb.hash_key, 0, EXACT, round(evaluation * 100), 0)
+            return evaluation
+
+        alpha_start = alpha
+        beta_start = beta
+        best_move = 0
+        if cb.player_turn == Piece.WHITE:
+            maxEval = -Minimax.infinite
+            move_list = cb.generate_legal_moves(cb.player_turn, ply)
+            Minimax.order_moves(cb, move_list, table_move, ply)
+            for index, move in enumerate(move_list):
+                cb.make_move(move)
+                evaluation = Minimax.searchABPruning(cb, depth - 1, alpha, beta, ply + 1)
+                if evaluation > maxEval:
+                    maxEval = evaluation
+                    best_move = move
+                alpha = max(alpha, maxEval)
+                cb.unmove()
+                if alpha >= beta:
+                    Minimax.count_cutoff(index)
+                    Minimax.store_cutoff(cb, move, depth, ply)
+                    break
+            bestEval = maxEval
+        else:
+            minEval = Minimax.infinite
+            move_list = cb.generate_legal_moves(cb.player_turn, ply)
+            Minimax.order_moves(cb, move_list, table_move, ply)
+            for index, move in enumerate(move_list):
+                cb.make_move(move)
+                evaluation = Minimax.searchABPruning(cb, depth - 1, alpha, beta, ply + 1)
+                if evaluation < minEval:
+                    minEval = evaluation
+                    best_move = move
+                beta = min(beta, minEval)
+                cb.unmove()
+                if beta <= alpha:
+                    Minimax.count_cutoff(index)
+                    Minimax.store_cutoff(cb, move, depth, ply)
+                    break
+            bestEval = minEval
+
+        if bestEval <= alpha_start:
+            bound = UPPER
+        elif bestEval >= beta_start:
+            bound = LOWER
+        else:
+            bound = EXACT
+        table.store(cb.hash_key, depth, bound, round(bestEval * 100), best_move)
+        if ply == 0:
+            Minimax.root_best_move = best_move
+
+        return bestEval
+
+# Body of a parallel_search helper process, searches until stop_event is set
+def search_worker(fen, table_name, table_size_mb, max_depth, options, stop_event, helper_nodes, worker_id):
+    cb = Chess()
+    cb.load_fen_position(fen)
+    table = TranspositionTable(table_size_mb, name=table_name)
+    Minimax.transposition_table = table
+    try:
+        Minimax.search(cb, max_depth, stop_flag=stop_event, options=options, start_depth=1 + worker_id % 2)
+    finally:
+        helper_nodes[worker_id] = Minimax.stats.nodes
+        table.close()
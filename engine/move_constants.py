@@ -1,5 +1,26 @@
 import enum
 
+## Moves used by the search are packed in a single int ##
+## bits 0-5: square from, 6-11: square to, 12-14: piece type, 15: piece color ##
+## 16-18: captured piece type (0 if not a capture), 19: castle ##
+MOVE_SQUARE_MASK = 63
+MOVE_TO_SHIFT = 6
+MOVE_PIECE_SHIFT = 12
+MOVE_COLOR_SHIFT = 15
+MOVE_CAPTURE_SHIFT = 16
+MOVE_CAPTURE_MASK = 7 << MOVE_CAPTURE_SHIFT
+MOVE_CASTLE = 1 << 19
+## A pass used by the search, no real move has the same square from and to ##
+NULL_MOVE = 0
+
+def encode_move(piece_color, piece_type, square_from, square_to, cpiece_type = None, castle = False):
+    move = square_from | (square_to << MOVE_TO_SHIFT) | (piece_type << MOVE_PIECE_SHIFT) | (piece_color << MOVE_COLOR_SHIFT)
+    if cpiece_type is not None:
+        move = move | (cpiece_type << MOVE_CAPTURE_SHIFT)
+    if castle:
+        move = move | MOVE_CASTLE
+    return move
+
 class Move():
     def __init__(self, piece_color, piece_type, square_from, square_to, cpiece_color = None, cpiece_type = None, castle = False):
         self.piece_color = piece_color
@@ -16,6 +37,25 @@ class Move():
         else:
             return False
 
+    # Pack the move in an int
+    def to_int(self):
+        return encode_move(self.piece_color, self.piece_type, self.square_from, self.square_to, self.cpiece_type, self.castle)
+
+    # Unpack an int move into a Move
+    @staticmethod
+    def from_int(move):
+        piece_color = Piece((move >> MOVE_COLOR_SHIFT) & 1)
+        piece_type = Piece((move >> MOVE_PIECE_SHIFT) & 7)
+        square_from = move & MOVE_SQUARE_MASK
+        square_to = (move >> MOVE_TO_SHIFT) & MOVE_SQUARE_MASK
+        cpiece_color = None
+        cpiece_type = None
+        if move & MOVE_CAPTURE_MASK:
+            cpiece_color = Piece(piece_color ^ 1)
+            cpiece_type = Piece((move >> MOVE_CAPTURE_SHIFT) & 7)
+
+        return Move(piece_color, piece_type, square_from, square_to, cpiece_color, cpiece_type, bool(move & MOVE_CASTLE))
+
 class Piece(enum.IntEnum):
     WHITE = 0
     BLACK = 1
@@ -26,6 +66,14 @@ class Piece(enum.IntEnum):
     QUEEN = 6
     KING = 7
 
+## Board squares hold a piece code, color << 3 | type, and EMPTY when there is no piece ##
+EMPTY = 0
+PIECE_COLOR_SHIFT = 3
+PIECE_TYPE_MASK = 7
+
+def piece_code(piece_color, piece_type):
+    return (piece_color << PIECE_COLOR_SHIFT) | piece_type
+
 class Square(enum.IntEnum):
     (A1, B1, C1, D1, E1, F1, G1, H1,
     A2, B2, C2, D2, E2, F2, G2, H2,
@@ -1,9 +1,74 @@
 import os
+import mmap
+import struct
+import zlib
 import numpy as np
-import pickle
-from engine.move_constants import Move, Piece, Square, Direction
+from array import array
+from engine.move_constants import Piece, Square, Direction
+from engine.bitutils import get_lsb, get_msb, popcount
+
+# Bitboards are plain python ints, results of shifts and nots are masked to 64 bits
+BOARD_MASK = 18446744073709551615
+
+# Magic tables are cached in a binary file, next to this module unless
+# PYCHESS_TABLE_PATH points somewhere else. The file is a header followed by
+# native 64 bit words: rook/bishop magics, shifts and offsets (64 each), then
+# the rook, rook xray, bishop and bishop xray tables. Bumping the version
+# makes old files get rebuilt.
+TABLE_FILE_NAME = "attack_tables.bin"
+TABLE_FILE_MAGIC = b"PYCHTBL\0"
+TABLE_FILE_VERSION = 1
+# magic, version, byte order marker, rook table size, bishop table size, crc32 of the data
+TABLE_HEADER = struct.Struct("=8sIQQQI")
+TABLE_BYTE_ORDER = 0x0102030405060708
+
+def get_table_path():
+    path = os.environ.get("PYCHESS_TABLE_PATH")
+    if path:
+        return path
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), TABLE_FILE_NAME)
 
 class MoveGenerator():
+    # Magic numbers found once with find_magic, if one stops fitting its square
+    # a new one is searched from magic_seed
+    magic_seed = 1337
+    rook_magic_numbers = (
+        0x208002c0001486e0, 0x840002004481000, 0x200104200088020, 0x880080010000480,
+        0xa00040200102088, 0x2200120030081104, 0x8c80020000800100, 0x2000c0080210446,
+        0x100208000410e, 0x84400020005000, 0x11002000124104, 0x18a004022000910,
+        0x2301000800110004, 0x85800400810a00, 0x104004882043001, 0x7105801040800500,
+        0x8040008020488004, 0x5010064000200040, 0x8020808010002000, 0x10010008201100,
+        0x800081800c000800, 0x4001010004000802, 0x2008040090410208, 0x6200020001204884,
+        0x8410500208002, 0x400880200083, 0x2010002020040800, 0x9006100100200900,
+        0x40080080080, 0x90c0020080040080, 0x410082400902201, 0x80005a00008409,
+        0x80002000404000, 0x1088200044401000, 0x2008042002012, 0x80080801000,
+        0x8408801c01800800, 0x8008020080800400, 0xc0019004000802, 0x2a10304082000401,
+        0x980800040008025, 0x40a0004000808020, 0x114208a00420010, 0xd005001004210008,
+        0xa0020005200a0010, 0x20004008080, 0x40001022180c0001, 0x4008004394020005,
+        0x2604402480010500, 0x840008100304100, 0x800100280200280, 0x482080080900480,
+        0x2024000408008080, 0x8800040080020080, 0x82800100020080, 0x4200010044108200,
+        0x100210080001841, 0x640002080441101, 0x6260110140092003, 0x10484420900101,
+        0x1002005004204882, 0x2005001088402, 0x20100100880204, 0x408104104002082
+    )
+    bishop_magic_numbers = (
+        0x471213004004040, 0x400808410042005c, 0x131040c00c30904, 0x20c140090000051,
+        0x3002021001206100, 0x28c82010000000, 0x604012410850050, 0x401002206204440,
+        0x80140408d0040088, 0x4004010238020460, 0x1000620082010a00, 0x82014614c14,
+        0x5840208310, 0x40000200c208401e, 0x108898201104, 0x4000001053908800,
+        0x4402008021800, 0x4439000820400, 0x8020408000808, 0x2001020801000,
+        0x2000402110000, 0x400e000108700401, 0x8000808c40405800, 0x2004a00e0081c049,
+        0x20128a1244200, 0x8108820080840800, 0x420001200960, 0x1000320000404200,
+        0x12001010601000, 0x2004014221201000, 0x1012045000444080, 0x41200812204c0,
+        0x2494010080200, 0x10028ac900522200, 0x4000101400026088, 0x848040a00014050,
+        0xc500820010020010, 0x8020820200001010, 0x824402a01400, 0x40031404304082bc,
+        0x2000804108004008, 0x4a0801030440, 0x48a8180884010600, 0x8481000200808800,
+        0x4020200904002140, 0x106015800208200, 0x210a409800010, 0x40050820031c200,
+        0x890080b005040180, 0x10910c0221040100, 0x844100000, 0x2c80a080000,
+        0x8810a818844400, 0x10010881090380, 0x851c015421140000, 0x6841154202002250,
+        0x4104402201010, 0x2004404040200, 0x9c40541000, 0x881004012104400,
+        0x4022048030400, 0x100011020280520, 0x104289210a40100, 0x48080208220c0011
+    )
+
     def __init__(self):
         self.knight_moves = [None]*64
         self.ray_moves = [None]*64
@@ -12,20 +77,16 @@ class MoveGenerator():
         self.king_moves = [None]*64
         self.pawn_attacks = [None]*64
         self.pawn_pushes = [None]*64
-        self.bishop_moveboard = [None]*64
-        self.rook_moveboard = [None]*64
-        self.bishop_xrays = [None]*64
-        self.rook_xrays = [None]*64
-
-        # Load previously created rook and bishop blockerboard to moveboard dictionaries
-        if os.path.isfile("sliding_pieces_dict.json"):
-            print("---- loading piece movement ----")
-            with (open('sliding_pieces_dict.json', 'rb')) as openfile:
-                sliding_pieces_dict = pickle.load(openfile)
-                self.rook_moveboard = sliding_pieces_dict['rook_moveboard']
-                self.bishop_moveboard = sliding_pieces_dict['bishop_moveboard']
-                self.rook_xrays = sliding_pieces_dict['rook_xrays']
-                self.bishop_xrays = sliding_pieces_dict['bishop_xrays']
+        self.bishop_magics = [None]*64
+        self.rook_magics = [None]*64
+        self.bishop_shifts = [None]*64
+        self.rook_shifts = [None]*64
+        self.bishop_offsets = [None]*64
+        self.rook_offsets = [None]*64
+        self.bishop_table = None
+        self.rook_table = None
+        self.bishop_xray_table = None
+        self.rook_xray_table = None
 
         # Initialize moves for each piece ##
         for i in range(64):
@@ -37,43 +98,97 @@ class MoveGenerator():
             self.pawn_attacks[i] = self.get_pawn_attacks(i)
             self.pawn_pushes[i] = self.get_pawn_pushes(i)
 
-        # Create dictionaries for rook and bishop if file doesnt exist
-        if not os.path.isfile("sliding_pieces_dict.json"):
+        # Load previously created rook and bishop magic tables
+        table_path = get_table_path()
+        if self.load_magic_tables(table_path):
+            print("---- loading piece movement ----")
+        # Create the magic tables for rook and bishop if file doesnt exist or is outdated
+        else:
             print("---- dumping piece movement ----")
-            for i in range(64):
-                self.rook_moveboard[i] = self.get_rook_attacks(i)
-                self.bishop_moveboard[i] = self.get_bishop_attacks(i)
-            print("---- moveboard dictionary loaded ----")
-            # Xray moves need moveboards to be loaded first
-            for i in range(64):
-                self.rook_xrays[i] = self.get_rook_xrays(i)
-                self.bishop_xrays[i] = self.get_bishop_xrays(i)
-            print("---- xray attacks loaded ----")
-
-            sliding_pieces_dict = {}
-            sliding_pieces_dict['rook_moveboard'] = self.rook_moveboard
-            sliding_pieces_dict['bishop_moveboard'] = self.bishop_moveboard
-            sliding_pieces_dict['rook_xrays'] = self.rook_xrays
-            sliding_pieces_dict['bishop_xrays'] = self.bishop_xrays
-
-            with open('sliding_pieces_dict.json', 'wb') as outfile:
-                pickle.dump(sliding_pieces_dict, outfile)
+            rng = np.random.default_rng(MoveGenerator.magic_seed)
+            self.rook_table, self.rook_xray_table = self.get_magic_tables(Piece.ROOK, rng)
+            print("---- rook magics loaded ----")
+            self.bishop_table, self.bishop_xray_table = self.get_magic_tables(Piece.BISHOP, rng)
+            print("---- bishop magics loaded ----")
+            self.save_magic_tables(table_path)
+
+        # The generator is shared, so its tables are made read only
+        for key in ('knight_moves', 'ray_moves', 'bishop_masks', 'rook_masks', 'king_moves',
+                    'pawn_attacks', 'pawn_pushes', 'bishop_magics', 'rook_magics',
+                    'bishop_shifts', 'rook_shifts', 'bishop_offsets', 'rook_offsets'):
+            values = getattr(self, key)
+            values = tuple(tuple(value) if isinstance(value, list) else value for value in values)
+            setattr(self, key, values)
+
+    # Map the table file read only so processes using it share the same pages.
+    # Returns False if the file is missing, from another version or corrupted
+    def load_magic_tables(self, path):
+        try:
+            with open(path, 'rb') as table_file:
+                data = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+
+        if len(data) < TABLE_HEADER.size:
+            return False
+        magic, version, byte_order, rook_size, bishop_size, checksum = TABLE_HEADER.unpack_from(data)
+        if magic != TABLE_FILE_MAGIC or version != TABLE_FILE_VERSION or byte_order != TABLE_BYTE_ORDER:
+            return False
+
+        words = memoryview(data)[TABLE_HEADER.size:]
+        if len(words) != (6*64 + 2*rook_size + 2*bishop_size) * 8 or zlib.crc32(words) != checksum:
+            return False
+        words = words.cast('Q')
+
+        # Small per square values are copied, the big tables stay in the mapping
+        self.rook_magics = words[0:64].tolist()
+        self.bishop_magics = words[64:128].tolist()
+        self.rook_shifts = words[128:192].tolist()
+        self.bishop_shifts = words[192:256].tolist()
+        self.rook_offsets = words[256:320].tolist()
+        self.bishop_offsets = words[320:384].tolist()
+        start = 384
+        self.rook_table = words[start:start + rook_size]
+        start = start + rook_size
+        self.rook_xray_table = words[start:start + rook_size]
+        start = start + rook_size
+        self.bishop_table = words[start:start + bishop_size]
+        start = start + bishop_size
+        self.bishop_xray_table = words[start:start + bishop_size]
+
+        return True
+
+    # Write the magic tables to path, through a temporary file so readers
+    # never map a half written one
+    def save_magic_tables(self, path):
+        words = array('Q')
+        for values in (self.rook_magics, self.bishop_magics, self.rook_shifts,
+                       self.bishop_shifts, self.rook_offsets, self.bishop_offsets):
+            words.extend(values)
+        for table in (self.rook_table, self.rook_xray_table, self.bishop_table, self.bishop_xray_table):
+            words.extend(table)
+        data = words.tobytes()
+
+        header = TABLE_HEADER.pack(TABLE_FILE_MAGIC, TABLE_FILE_VERSION, TABLE_BYTE_ORDER,
+                                   len(self.rook_table), len(self.bishop_table), zlib.crc32(data))
+        temp_path = "%s.%d.tmp" % (path, os.getpid())
+        try:
+            with open(temp_path, 'wb') as outfile:
+                outfile.write(header)
+                outfile.write(data)
+            os.replace(temp_path, path)
+        except OSError as error:
+            print("---- could not save piece movement: %s ----" % error)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
 
     ## Get least significant bit ##
     def get_lsb(self, n):
-        i=0
-        while((n>>np.uint64(i))%2==0):
-            i+=1
-
-        return i
+        return get_lsb(n)
 
     ## Get most significant bit ##
     def get_msb(self, n):
-        i=63
-        while((n>>np.uint64(i))%2==0 and i != 0):
-            i-=1
-
-        return i
+        return get_msb(n)
 
     #Generate a unique blocker board, given an index (0..2^bits) and the blocker mask 
     #for the piece/square. Each index will give a unique blocker board. 
@@ -82,9 +197,9 @@ class MoveGenerator():
         bitindex = 0
 
         for i in range(64):
-            if np.bitwise_and(blockermask, np.uint64(1 << i)) != 0:
-                if (np.bitwise_and(index, (1 << bitindex))) == 0:
-                    blockerboard = np.bitwise_and(blockerboard, np.bitwise_not(np.uint64(1 << i)))
+            if blockermask & (1 << i) != 0:
+                if index & (1 << bitindex) == 0:
+                    blockerboard = blockerboard & ((1 << i) ^ BOARD_MASK)
                 bitindex = bitindex + 1
 
         return blockerboard
@@ -119,27 +234,27 @@ class MoveGenerator():
         moves = [None]*2
 
         if self.is_afile(square):
-            moves[Piece.WHITE] = np.uint64(1024)
-            moves[Piece.BLACK] = np.uint64(1024)
+            moves[Piece.WHITE] = 1024
+            moves[Piece.BLACK] = 1024
         elif self.is_hfile(square):
-            moves[Piece.WHITE] = np.uint64(256)
-            moves[Piece.BLACK] = np.uint64(256)
+            moves[Piece.WHITE] = 256
+            moves[Piece.BLACK] = 256
         else:
-            moves[Piece.WHITE] = np.uint64(1280)
-            moves[Piece.BLACK] = np.uint64(1280)
+            moves[Piece.WHITE] = 1280
+            moves[Piece.BLACK] = 1280
 
         white_shift = square - 1  
         black_shift = square - 17
 
         if white_shift >= 0: 
-            moves[Piece.WHITE] = moves[Piece.WHITE] << np.uint64(white_shift)
+            moves[Piece.WHITE] = (moves[Piece.WHITE] << white_shift) & BOARD_MASK
         else:
-            moves[Piece.WHITE] = moves[Piece.WHITE] >> np.uint64(white_shift*-1)
+            moves[Piece.WHITE] = moves[Piece.WHITE] >> (white_shift*-1)
         
         if black_shift >= 0: 
-            moves[Piece.BLACK] = moves[Piece.BLACK] << np.uint64(black_shift)
+            moves[Piece.BLACK] = (moves[Piece.BLACK] << black_shift) & BOARD_MASK
         else:
-            moves[Piece.BLACK] = moves[Piece.BLACK] >> np.uint64(black_shift*-1)
+            moves[Piece.BLACK] = moves[Piece.BLACK] >> (black_shift*-1)
 
         return moves
 
@@ -148,23 +263,23 @@ class MoveGenerator():
         moves = [None]*2
 
         if self.is_second_rank(square):
-            moves[Piece.WHITE] = np.uint64(65792)
-            moves[Piece.BLACK] = np.uint64(256)
+            moves[Piece.WHITE] = 65792
+            moves[Piece.BLACK] = 256
         elif self.is_seventh_rank(square):
-            moves[Piece.WHITE] = np.uint64(256)
-            moves[Piece.BLACK] = np.uint64(257)
+            moves[Piece.WHITE] = 256
+            moves[Piece.BLACK] = 257
         else:
-            moves[Piece.WHITE] = np.uint64(256)
-            moves[Piece.BLACK] = np.uint64(256)
+            moves[Piece.WHITE] = 256
+            moves[Piece.BLACK] = 256
   
         black_shift = square - 16
 
-        moves[Piece.WHITE] = moves[Piece.WHITE] << np.uint64(square)
+        moves[Piece.WHITE] = (moves[Piece.WHITE] << square) & BOARD_MASK
         
         if black_shift >= 0: 
-            moves[Piece.BLACK] = moves[Piece.BLACK] << np.uint64(black_shift)
+            moves[Piece.BLACK] = (moves[Piece.BLACK] << black_shift) & BOARD_MASK
         else:
-            moves[Piece.BLACK] = moves[Piece.BLACK] >> np.uint64(black_shift*-1)
+            moves[Piece.BLACK] = moves[Piece.BLACK] >> (black_shift*-1)
 
         return moves
 
@@ -173,22 +288,22 @@ class MoveGenerator():
         moves = None
 
         if self.is_afile(square):
-            moves = np.uint64(34628177928)
+            moves = 34628177928
         elif self.is_bfile(square):
-            moves = np.uint64(43218112522)
+            moves = 43218112522
         elif self.is_gfile(square):
-            moves = np.uint64(42966450442)
+            moves = 42966450442
         elif self.is_hfile(square):
-            moves = np.uint64(8606712066)
+            moves = 8606712066
         else:
-            moves = np.uint64(43234889994)
+            moves = 43234889994
 
         shift_size = square - 18  
 
         if shift_size >= 0: 
-            moves = moves << np.uint64(shift_size)
+            moves = (moves << shift_size) & BOARD_MASK
         else:
-            moves = moves >> np.uint64(shift_size*-1)
+            moves = moves >> (shift_size*-1)
 
         return moves
     
@@ -199,42 +314,42 @@ class MoveGenerator():
         piece_file = square%8
 
         #Generate lines
-        north = np.uint64(72340172838076672) << np.uint64(square)
+        north = (72340172838076672 << square) & BOARD_MASK
         moves[Direction.NORTH] = north
 
-        south = np.uint64(282578800148737) >> np.uint64((7 - piece_rank)*8)
-        south = south << np.uint64(piece_file)
+        south = 282578800148737 >> ((7 - piece_rank)*8)
+        south = south << piece_file
         moves[Direction.SOUTH] = south
 
-        east = np.uint64(2**(7 - piece_file) - 1) << np.uint64(square + 1)
+        east = (2**(7 - piece_file) - 1) << (square + 1)
         moves[Direction.EAST] = east
         
-        west = np.uint64(2**(piece_file) - 1) << np.uint64(square - piece_file)
+        west = (2**(piece_file) - 1) << (square - piece_file)
         moves[Direction.WEST] = west
 
         #Generate diagonals
-        north_east = np.uint64(9241421688590303744) << np.uint64(square)
+        north_east = (9241421688590303744 << square) & BOARD_MASK
         wrap_size = piece_file - 1 - piece_rank
         for i in range(wrap_size):
-            north_east = np.bitwise_xor(north_east, (np.uint64(1) << np.uint64(self.get_msb(north_east))))
+            north_east = north_east ^ (1 << self.get_msb(north_east))
         moves[Direction.NORTH_EAST] = north_east
 
-        north_west = np.uint64(567382630219904) << np.uint64(square)
+        north_west = (567382630219904 << square) & BOARD_MASK
         wrap_size = 8 - piece_file - piece_rank if piece_rank != 0 else 7 - piece_file
         for i in range(wrap_size):
-            north_west = np.bitwise_xor(north_west, (np.uint64(1) << np.uint64(self.get_msb(north_west))))
+            north_west = north_west ^ (1 << self.get_msb(north_west))
         moves[Direction.NORTH_WEST] = north_west
 
-        south_east = np.uint64(72624976668147712) >> np.uint64(63 - square)
+        south_east = 72624976668147712 >> (63 - square)
         wrap_size = piece_file + piece_rank - 6 if piece_rank != 7 else piece_file
         for i in range(wrap_size):
-            south_east = np.bitwise_xor(south_east, (np.uint64(1) << np.uint64(self.get_lsb(south_east))))
+            south_east = south_east ^ (1 << self.get_lsb(south_east))
         moves[Direction.SOUTH_EAST] = south_east
 
-        south_west = np.uint64(18049651735527937) >> np.uint64(63 - square)
+        south_west = 18049651735527937 >> (63 - square)
         wrap_size = piece_rank - piece_file - 1
         for i in range(wrap_size):
-            south_west = np.bitwise_xor(south_west, (np.uint64(1) << np.uint64(self.get_lsb(south_west))))
+            south_west = south_west ^ (1 << self.get_lsb(south_west))
         moves[Direction.SOUTH_WEST] = south_west
 
         return moves
@@ -243,182 +358,243 @@ class MoveGenerator():
     def get_bishop_mask(self, square):
         mask = None
 
-        north_west = np.bitwise_and(np.uint64(18374403900871474688), self.ray_moves[square][Direction.NORTH_WEST])
-        south_west = np.bitwise_and(np.uint64(71775015237779198), self.ray_moves[square][Direction.SOUTH_WEST])
-        north_east = np.bitwise_and(np.uint64(9187201950435737344), self.ray_moves[square][Direction.NORTH_EAST])
-        south_east = np.bitwise_and(np.uint64(35887507618889599), self.ray_moves[square][Direction.SOUTH_EAST])
+        north_west = 18374403900871474688 & self.ray_moves[square][Direction.NORTH_WEST]
+        south_west = 71775015237779198 & self.ray_moves[square][Direction.SOUTH_WEST]
+        north_east = 9187201950435737344 & self.ray_moves[square][Direction.NORTH_EAST]
+        south_east = 35887507618889599 & self.ray_moves[square][Direction.SOUTH_EAST]
 
-        west = np.bitwise_or(north_west, south_west)  
-        east = np.bitwise_or(north_east, south_east)
-        mask = np.bitwise_or(west, east)
+        west = north_west | south_west
+        east = north_east | south_east
+        mask = west | east
 
         return mask
 
     # Get move board from a blocker board for bishop
     def get_bishop_moveboard(self, square, blocker_board):
-        west = np.bitwise_or(self.ray_moves[square][Direction.NORTH_WEST], self.ray_moves[square][Direction.SOUTH_WEST])
-        east = np.bitwise_or(self.ray_moves[square][Direction.NORTH_EAST], self.ray_moves[square][Direction.SOUTH_EAST])
-        moveboard = np.bitwise_or(west, east)
+        west = self.ray_moves[square][Direction.NORTH_WEST] | self.ray_moves[square][Direction.SOUTH_WEST]
+        east = self.ray_moves[square][Direction.NORTH_EAST] | self.ray_moves[square][Direction.SOUTH_EAST]
+        moveboard = west | east
 
-        nwest_blocker = np.bitwise_and(self.ray_moves[square][Direction.NORTH_WEST], blocker_board)
+        nwest_blocker = self.ray_moves[square][Direction.NORTH_WEST] & blocker_board
         if nwest_blocker != 0:
             first_blocker = self.get_lsb(nwest_blocker)
-            moveboard = np.bitwise_xor(self.ray_moves[first_blocker][Direction.NORTH_WEST], moveboard)
+            moveboard = self.ray_moves[first_blocker][Direction.NORTH_WEST] ^ moveboard
         
-        neast_blocker = np.bitwise_and(self.ray_moves[square][Direction.NORTH_EAST], blocker_board)
+        neast_blocker = self.ray_moves[square][Direction.NORTH_EAST] & blocker_board
         if neast_blocker != 0:
             first_blocker = self.get_lsb(neast_blocker)
-            moveboard = np.bitwise_xor(self.ray_moves[first_blocker][Direction.NORTH_EAST], moveboard)
+            moveboard = self.ray_moves[first_blocker][Direction.NORTH_EAST] ^ moveboard
         
-        swest_blocker = np.bitwise_and(self.ray_moves[square][Direction.SOUTH_WEST], blocker_board)
+        swest_blocker = self.ray_moves[square][Direction.SOUTH_WEST] & blocker_board
         if swest_blocker != 0:
             first_blocker = self.get_msb(swest_blocker)
-            moveboard = np.bitwise_xor(self.ray_moves[first_blocker][Direction.SOUTH_WEST], moveboard)
+            moveboard = self.ray_moves[first_blocker][Direction.SOUTH_WEST] ^ moveboard
         
-        seast_blocker = np.bitwise_and(self.ray_moves[square][Direction.SOUTH_EAST], blocker_board)
+        seast_blocker = self.ray_moves[square][Direction.SOUTH_EAST] & blocker_board
         if seast_blocker != 0:
             first_blocker = self.get_msb(seast_blocker)
-            moveboard = np.bitwise_xor(self.ray_moves[first_blocker][Direction.SOUTH_EAST], moveboard)
+            moveboard = self.ray_moves[first_blocker][Direction.SOUTH_EAST] ^ moveboard
 
         return moveboard
 
-    # Get dictionary of keys: blockerboard values: moveboard , from a square
-    def get_bishop_attacks(self, square):
-        blockermask = self.bishop_masks[square]
-        bits = bin(blockermask).count("1")
-
-        blockerboard_to_moveboard = {}
-
-        for j in range((1<<bits)):
-            blockerboard = self.gen_blockerboard(j, blockermask)
-            blockerboard_to_moveboard[blockerboard] = self.get_bishop_moveboard(square, blockerboard)
-
-        return blockerboard_to_moveboard
-
-    # Get bishop xray attacks(the attacks behind the first blockers)
-    def get_bishop_xrays(self, square):
-        blockermask = self.bishop_masks[square]
-        bits = bin(blockermask).count("1")
-
-        blockerboard_to_moveboard = {}
-
-        for j in range((1<<bits)):
-            blockerboard = self.gen_blockerboard(j, blockermask)
-            blockers = np.bitwise_and(blockerboard, self.bishop_moveboard[square][blockerboard])
-            xray_moves = np.uint64(0)
-
-            while blockers > 0:
-                blocker_square = self.get_lsb(blockers)
-                new_blockerboard = np.bitwise_and(self.bishop_masks[blocker_square], blockerboard)
-                new_ray = np.bitwise_and(self.bishop_moveboard[square][0], np.bitwise_not(self.bishop_moveboard[square][blockerboard]))
-                new_ray = np.bitwise_and(self.bishop_moveboard[blocker_square][new_blockerboard], new_ray)
-                xray_moves = np.bitwise_or(xray_moves, new_ray)
-                blocker_square = np.uint64(1) << np.uint64(blocker_square)
-                blockers = np.bitwise_xor(blocker_square, blockers)
-
-            blockerboard_to_moveboard[blockerboard] = xray_moves
-
-        return blockerboard_to_moveboard
-
     # Fill rook moves 
     def get_rook_mask(self, square):
         mask = None 
 
-        west = np.bitwise_and(np.uint64(18374403900871474942), self.ray_moves[square][Direction.WEST])
-        east = np.bitwise_and(np.uint64(9187201950435737471), self.ray_moves[square][Direction.EAST])
-        north = np.bitwise_and(np.uint64(72057594037927935), self.ray_moves[square][Direction.NORTH])
-        south = np.bitwise_and(np.uint64(18446744073709551360), self.ray_moves[square][Direction.SOUTH])
+        west = 18374403900871474942 & self.ray_moves[square][Direction.WEST]
+        east = 9187201950435737471 & self.ray_moves[square][Direction.EAST]
+        north = 72057594037927935 & self.ray_moves[square][Direction.NORTH]
+        south = 18446744073709551360 & self.ray_moves[square][Direction.SOUTH]
         
-        west_east = np.bitwise_or(west, east)
-        north_south = np.bitwise_or(north, south)
-        mask = np.bitwise_or(west_east, north_south)
+        west_east = west | east
+        north_south = north | south
+        mask = west_east | north_south
 
         return mask
 
     # Get move board from a blocker board for rook
     def get_rook_moveboard(self, square, blocker_board):
-        north_south = np.bitwise_or(self.ray_moves[square][Direction.NORTH], self.ray_moves[square][Direction.SOUTH])
-        west_east = np.bitwise_or(self.ray_moves[square][Direction.WEST], self.ray_moves[square][Direction.EAST])
-        moveboard = np.bitwise_or(north_south, west_east)
+        north_south = self.ray_moves[square][Direction.NORTH] | self.ray_moves[square][Direction.SOUTH]
+        west_east = self.ray_moves[square][Direction.WEST] | self.ray_moves[square][Direction.EAST]
+        moveboard = north_south | west_east
 
-        north_blocker = np.bitwise_and(self.ray_moves[square][Direction.NORTH], blocker_board)
+        north_blocker = self.ray_moves[square][Direction.NORTH] & blocker_board
         if north_blocker != 0:
             first_blocker = self.get_lsb(north_blocker)
-            moveboard = np.bitwise_xor(self.ray_moves[first_blocker][Direction.NORTH], moveboard)
+            moveboard = self.ray_moves[first_blocker][Direction.NORTH] ^ moveboard
         
-        south_blocker = np.bitwise_and(self.ray_moves[square][Direction.SOUTH], blocker_board)
+        south_blocker = self.ray_moves[square][Direction.SOUTH] & blocker_board
         if south_blocker != 0:
             first_blocker = self.get_msb(south_blocker)
-            moveboard = np.bitwise_xor(self.ray_moves[first_blocker][Direction.SOUTH], moveboard)
+            moveboard = self.ray_moves[first_blocker][Direction.SOUTH] ^ moveboard
         
-        east_blocker = np.bitwise_and(self.ray_moves[square][Direction.EAST], blocker_board)
+        east_blocker = self.ray_moves[square][Direction.EAST] & blocker_board
         if east_blocker != 0:
             first_blocker = self.get_lsb(east_blocker)
-            moveboard = np.bitwise_xor(self.ray_moves[first_blocker][Direction.EAST], moveboard)
+            moveboard = self.ray_moves[first_blocker][Direction.EAST] ^ moveboard
         
-        west_blocker = np.bitwise_and(self.ray_moves[square][Direction.WEST], blocker_board)
+        west_blocker = self.ray_moves[square][Direction.WEST] & blocker_board
         if west_blocker != 0:
             first_blocker = self.get_msb(west_blocker)
-            moveboard = np.bitwise_xor(self.ray_moves[first_blocker][Direction.WEST], moveboard)
+            moveboard = self.ray_moves[first_blocker][Direction.WEST] ^ moveboard
 
         return moveboard
 
-    # Get dictionary of keys: blockerboard values: moveboard , from a square
-    def get_rook_attacks(self, square):
-        blockermask = self.rook_masks[square]
-        bits = bin(blockermask).count("1")
-
-        blockerboard_to_moveboard = {}
-
-        for j in range((1<<bits)):
-            blockerboard = self.gen_blockerboard(j, blockermask)
-            blockerboard_to_moveboard[blockerboard] = self.get_rook_moveboard(square, blockerboard)
-
-        return blockerboard_to_moveboard
-
-    # Get rook xray attacks(the attacks behind the first blockers)
-    def get_rook_xrays(self, square):
-        blockermask = self.rook_masks[square]
-        bits = bin(blockermask).count("1")
-
-        blockerboard_to_moveboard = {}
-
-        for j in range((1<<bits)):
-            blockerboard = self.gen_blockerboard(j, blockermask)
-            blockers = np.bitwise_and(blockerboard, self.rook_moveboard[square][blockerboard])
-            xray_moves = np.uint64(0)
-
-            while blockers > 0:
-                blocker_square = self.get_lsb(blockers)
-                new_blockerboard = np.bitwise_and(self.rook_masks[blocker_square], blockerboard)
-                new_ray = np.bitwise_and(self.rook_moveboard[square][0], np.bitwise_not(self.rook_moveboard[square][blockerboard]))
-                new_ray = np.bitwise_and(self.rook_moveboard[blocker_square][new_blockerboard], new_ray)
-                xray_moves = np.bitwise_or(xray_moves, new_ray)
-                blocker_square = np.uint64(1) << np.uint64(blocker_square)
-                blockers = np.bitwise_xor(blocker_square, blockers)
-
-            blockerboard_to_moveboard[blockerboard] = xray_moves
-
-        return blockerboard_to_moveboard
-
     ## Fill king moves ##
     def get_king_moves(self, square):
         moves = None
 
         if self.is_afile(square):
-            moves = np.uint64(394246)
+            moves = 394246
         elif self.is_hfile(square):
-            moves = np.uint64(196867)
+            moves = 196867
         else:
-            moves = np.uint64(460039)
+            moves = 460039
 
         shift_size = square - 9  
 
         if shift_size >= 0: 
-            moves = moves << np.uint64(shift_size)
+            moves = (moves << shift_size) & BOARD_MASK
         else:
-            moves = moves >> np.uint64(shift_size*-1)
+            moves = moves >> (shift_size*-1)
 
         return moves
 
-        
\ No newline at end of file
+    # Get rook attacks from a square given the occupied squares
+    def rook_attacks(self, square, occupied):
+        return self.rook_table[self.rook_index(square, occupied)]
+
+    # Get rook xray attacks(the attacks behind the first blockers) given the occupied squares
+    def rook_xray_attacks(self, square, occupied):
+        return self.rook_xray_table[self.rook_index(square, occupied)]
+
+    # Get bishop attacks from a square given the occupied squares
+    def bishop_attacks(self, square, occupied):
+        return self.bishop_table[self.bishop_index(square, occupied)]
+
+    # Get bishop xray attacks(the attacks behind the first blockers) given the occupied squares
+    def bishop_xray_attacks(self, square, occupied):
+        return self.bishop_xray_table[self.bishop_index(square, occupied)]
+
+    # Map the relevant occupied squares to an index of the flat rook table
+    def rook_index(self, square, occupied):
+        blockerboard = occupied & self.rook_masks[square]
+        index = ((blockerboard * self.rook_magics[square]) & BOARD_MASK) >> self.rook_shifts[square]
+        return self.rook_offsets[square] + index
+
+    # Map the relevant occupied squares to an index of the flat bishop table
+    def bishop_index(self, square, occupied):
+        blockerboard = occupied & self.bishop_masks[square]
+        index = ((blockerboard * self.bishop_magics[square]) & BOARD_MASK) >> self.bishop_shifts[square]
+        return self.bishop_offsets[square] + index
+
+    # Get moveboard and xray moveboard from a blocker board for rook or bishop
+    def get_sliding_moveboards(self, square, blockerboard, piece_type):
+        if piece_type == Piece.ROOK:
+            get_moveboard = self.get_rook_moveboard
+        else:
+            get_moveboard = self.get_bishop_moveboard
+
+        moveboard = get_moveboard(square, blockerboard)
+
+        # Xray attacks are the attacks once the first blockers are removed
+        first_blockers = blockerboard & moveboard
+        xray_moves = get_moveboard(square, blockerboard ^ first_blockers)
+        xray_moves = xray_moves & (moveboard ^ BOARD_MASK)
+
+        return moveboard, xray_moves
+
+    # Build the flat rook or bishop tables for every square, using a magic
+    # number per square that maps each blocker board to its own slot
+    def get_magic_tables(self, piece_type, rng):
+        if piece_type == Piece.ROOK:
+            masks, magics, shifts, offsets = self.rook_masks, self.rook_magics, self.rook_shifts, self.rook_offsets
+            magic_numbers = MoveGenerator.rook_magic_numbers
+        else:
+            masks, magics, shifts, offsets = self.bishop_masks, self.bishop_magics, self.bishop_shifts, self.bishop_offsets
+            magic_numbers = MoveGenerator.bishop_magic_numbers
+
+        tables = []
+        xray_tables = []
+        offset = 0
+
+        for square in range(64):
+            blockermask = masks[square]
+            bits = popcount(blockermask)
+
+            # Enumerate every subset of the mask
+            blockerboards = []
+            blockerboard = 0
+            while True:
+                blockerboards.append(blockerboard)
+                blockerboard = (blockerboard - blockermask) & blockermask
+                if blockerboard == 0:
+                    break
+
+            moveboards = []
+            xray_moves = []
+            for blockerboard in blockerboards:
+                moveboard, xray = self.get_sliding_moveboards(square, blockerboard, piece_type)
+                moveboards.append(moveboard)
+                xray_moves.append(xray)
+
+            blockerboards = np.array(blockerboards, dtype=np.uint64)
+            moveboards = np.array(moveboards, dtype=np.uint64)
+            xray_moves = np.array(xray_moves, dtype=np.uint64)
+            magic = magic_numbers[square]
+            table, xray_table = self.fill_magic_tables(magic, bits, blockerboards, moveboards, xray_moves)
+            if table is None:
+                magic, table, xray_table = self.find_magic(blockermask, bits, blockerboards, moveboards, xray_moves, rng)
+
+            magics[square] = magic
+            shifts[square] = 64 - bits
+            offsets[square] = offset
+            offset = offset + len(table)
+            tables.append(table)
+            xray_tables.append(xray_table)
+
+        # Lookups go through array so they return python ints
+        return array('Q', np.concatenate(tables).tobytes()), array('Q', np.concatenate(xray_tables).tobytes())
+
+    # Try random sparse numbers until one indexes all blocker boards without a destructive collision
+    def find_magic(self, blockermask, bits, blockerboards, moveboards, xray_moves, rng):
+        while True:
+            candidates = rng.integers(0, 2**64, size=(3, 1024), dtype=np.uint64)
+            candidates = candidates[0] & candidates[1] & candidates[2]
+
+            for magic in candidates.tolist():
+                # Good magics spread the mask into the high bits
+                if popcount(((blockermask * magic) & BOARD_MASK) >> 56) < 6:
+                    continue
+
+                table, xray_table = self.fill_magic_tables(magic, bits, blockerboards, moveboards, xray_moves)
+                if table is not None:
+                    return magic, table, xray_table
+
+    # Place every moveboard and xray at its magic index, None if two blocker boards
+    # sharing an index need different values
+    def fill_magic_tables(self, magic, bits, blockerboards, moveboards, xray_moves):
+        index = (blockerboards * np.uint64(magic)) >> np.uint64(64 - bits)
+
+        table = np.zeros(1 << bits, dtype=np.uint64)
+        table[index] = moveboards
+        if not np.array_equal(table[index], moveboards):
+            return None, None
+
+        xray_table = np.zeros(1 << bits, dtype=np.uint64)
+        xray_table[index] = xray_moves
+        if not np.array_equal(xray_table[index], xray_moves):
+            return None, None
+
+        return table, xray_table
+
+# One generator is shared by every Chess instance. It is built the first time
+# it is asked for, building it before starting worker processes lets forked
+# children use the parent's tables copy on write
+shared_generator = None
+
+def get_generator():
+    global shared_generator
+    if shared_generator is None:
+        shared_generator = MoveGenerator()
+    return shared_generator
@@ -0,0 +1,138 @@
+import sys
+import time
+import argparse
+from engine.chess_logic import Chess
+from engine.move_constants import Move, Square
+
+# Positions with the node counts this engine produces at depth 1, 2, 3...
+# The counts freeze the current move generation so any change to it shows
+# up, they aren't a correctness reference. They differ from the published
+# ones (kept in the comments) because the engine has no en passant or
+# promotions, castles through attacked squares and has other known move
+# generation bugs, like pins it doesn't always detect
+PERFT_SUITE = [
+    ("startpos", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+     [20, 400, 8902, 197281]),
+    # Published: 48, 2039, 97862
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2043, 98154]),
+    # Published: 14, 191, 2812, 43238
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 191, 2810, 43087]),
+    # Position the gui loads. Published: 6, 264, 9467
+    ("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 234, 8311]),
+    # Published: 44, 1486, 62379
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [41, 1383, 54139]),
+]
+
+## Count the leaf nodes of the move tree up to depth ##
+def perft(cb, depth, ply=0):
+    if depth <= 0:
+        return 1
+
+    moves = cb.generate_legal_moves(cb.player_turn, ply)
+    # Leaves are counted without playing them
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        cb.make_move(move)
+        nodes = nodes + perft(cb, depth - 1, ply + 1)
+        cb.unmove()
+
+    return nodes
+
+## Returns a list of (move, nodes) with the perft of every root move ##
+def divide(cb, depth):
+    results = []
+    # A copy since the buffer of ply 0 is reused by the calls below
+    for move in list(cb.generate_legal_moves(cb.player_turn, 0)):
+        cb.make_move(move)
+        nodes = perft(cb, depth - 1, 1)
+        cb.unmove()
+        results.append((move, nodes))
+
+    return results
+
+# Move in coordinate notation, like e2e4
+def move_name(move):
+    move = Move.from_int(move)
+    return Square(move.square_from).name.lower() + Square(move.square_to).name.lower()
+
+def print_divide(cb, depth):
+    start = time.perf_counter()
+    results = divide(cb, depth)
+    elapsed = time.perf_counter() - start
+
+    nodes = 0
+    for move, move_nodes in sorted(results, key=lambda result: move_name(result[0])):
+        print("%s: %d" % (move_name(move), move_nodes))
+        nodes = nodes + move_nodes
+
+    print("\nMoves: %d" % len(results))
+    print("Nodes: %d" % nodes)
+    print_speed(nodes, elapsed)
+
+    return nodes
+
+def print_speed(nodes, elapsed):
+    nps = nodes / elapsed if elapsed > 0 else 0
+    print("Time: %.3fs, %d nodes per second" % (elapsed, nps))
+
+## Run every suite position up to max_depth, returns False on any wrong count ##
+def run_suite(max_depth=None):
+    cb = Chess()
+    passed = True
+    total_nodes = 0
+    total_time = 0
+
+    for name, fen, counts in PERFT_SUITE:
+        cb.load_fen_position(fen)
+        for depth, expected in enumerate(counts, 1):
+            if max_depth is not None and depth > max_depth:
+                break
+
+            start = time.perf_counter()
+            nodes = perft(cb, depth)
+            elapsed = time.perf_counter() - start
+            total_nodes = total_nodes + nodes
+            total_time = total_time + elapsed
+
+            status = "ok" if nodes == expected else "FAIL expected %d" % expected
+            print("%-10s depth %d: %10d  %.3fs  %s" % (name, depth, nodes, elapsed, status))
+            if nodes != expected:
+                passed = False
+
+    print()
+    print_speed(total_nodes, total_time)
+
+    return passed
+
+# Depths below 1 have no moves to divide
+def depth_argument(value):
+    depth = int(value)
+    if depth < 1:
+        raise argparse.ArgumentTypeError("depth must be at least 1")
+    return depth
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Count move generation leaf nodes")
+    parser.add_argument("depth", type=depth_argument, nargs="?", default=3)
+    parser.add_argument("--fen", default=PERFT_SUITE[0][1], help="position to count, the start position by default")
+    parser.add_argument("--suite", action="store_true", help="check the known positions up to depth instead")
+    args = parser.parse_args(args)
+
+    if args.suite:
+        return 0 if run_suite(args.depth) else 1
+
+    cb = Chess()
+    cb.load_fen_position(args.fen)
+    print_divide(cb, args.depth)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+import numpy as np
+from engine.move_constants import Piece, piece_code
+from engine.bitutils import popcount
+
+# Centipawn value of each piece type
+material_values = [0, 0, 1, 350, 350, 525, 1000, 0]
+
+# Weight of each piece type in the game phase, the phase is max_phase with
+# every piece on the board and falls to 0 as pieces are taken. Scores are
+# kept as a middlegame and an endgame value blended by the phase
+phase_values = [0, 0, 0, 1, 1, 2, 4, 0]
+max_phase = 24
+
+# Piece square tables are written from the eighth rank, white squares are
+# read mirrored. Tables without an endgame version are used for both
+pawn_table = (
+    0,  0,  0,  0,  0,  0,  0,  0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5,  5, 10, 25, 25, 10,  5,  5,
+    0,  0,  0, 20, 20,  0,  0,  0,
+    5, -5,-10,  0,  0,-10, -5,  5,
+    5, 10, 10,-20,-20, 10, 10,  5,
+    0,  0,  0,  0,  0,  0,  0,  0
+)
+knight_table = (
+    -50,-40,-30,-30,-30,-30,-40,-50,
+    -40,-20,  0,  0,  0,  0,-20,-40,
+    -30,  0, 10, 15, 15, 10,  0,-30,
+    -30,  5, 15, 20, 20, 15,  5,-30,
+    -30,  0, 15, 20, 20, 15,  0,-30,
+    -30,  5, 10, 15, 15, 10,  5,-30,
+    -40,-20,  0,  5,  5,  0,-20,-40,
+    -50,-40,-30,-30,-30,-30,-40,-50
+)
+bishop_table = (
+    -20,-10,-10,-10,-10,-10,-10,-20,
+    -10,  0,  0,  0,  0,  0,  0,-10,
+    -10,  0,  5, 10, 10,  5,  0,-10,
+    -10,  5,  5, 10, 10,  5,  5,-10,
+    -10,  0, 10, 10, 10, 10,  0,-10,
+    -10, 10, 10, 10, 10, 10, 10,-10,
+    -10,  5,  0,  0,  0,  0,  5,-10,
+    -20,-10,-10,-10,-10,-10,-10,-20
+)
+rook_table = (
+    0,  0,  0,  0,  0,  0,  0,  0,
+    5, 10, 10, 10, 10, 10, 10,  5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    -5,  0,  0,  0,  0,  0,  0, -5,
+    0,  0,  0,  5,  5,  0,  0,  0
+)
+queen_table = (
+    -20,-10,-10, -5, -5,-10,-10,-20,
+    -10,  0,  0,  0,  0,  0,  0,-10,
+    -10,  0,  5,  5,  5,  5,  0,-10,
+    -5,  0,  5,  5,  5,  5,  0, -5,
+    0,  0,  5,  5,  5,  5,  0, -5,
+    -10,  5,  5,  5,  5,  5,  0,-10,
+    -10,  0,  5,  0,  0,  0,  0,-10,
+    -20,-10,-10, -5, -5,-10,-10,-20
+)
+king_table_middlegame = (
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -30,-40,-40,-50,-50,-40,-40,-30,
+    -20,-30,-30,-40,-40,-30,-30,-20,
+    -10,-20,-20,-20,-20,-20,-20,-10,
+    20, 20,  0,  0,  0,  0, 20, 20,
+    20, 30, 10,  0,  0, 10, 30, 20
+)
+# In the endgame pawns are worth more the further they advance
+pawn_table_endgame = (
+    0,  0,  0,  0,  0,  0,  0,  0,
+    80, 80, 80, 80, 80, 80, 80, 80,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    30, 30, 30, 30, 30, 30, 30, 30,
+    15, 15, 15, 15, 15, 15, 15, 15,
+    5,  5,  5,  5,  5,  5,  5,  5,
+    0,  0,  0,  0,  0,  0,  0,  0,
+    0,  0,  0,  0,  0,  0,  0,  0
+)
+# Without queens the king leaves its shelter for the center
+king_table_endgame = (
+    -50,-40,-30,-20,-20,-30,-40,-50,
+    -30,-20,-10,  0,  0,-10,-20,-30,
+    -30,-10, 20, 30, 30, 20,-10,-30,
+    -30,-10, 30, 40, 40, 30,-10,-30,
+    -30,-10, 30, 40, 40, 30,-10,-30,
+    -30,-10, 20, 30, 30, 20,-10,-30,
+    -30,-30,  0,  0,  0,  0,-30,-30,
+    -50,-30,-30,-30,-30,-30,-30,-50
+)
+piece_tables_middlegame = {
+    Piece.PAWN: pawn_table,
+    Piece.KNIGHT: knight_table,
+    Piece.BISHOP: bishop_table,
+    Piece.ROOK: rook_table,
+    Piece.QUEEN: queen_table,
+    Piece.KING: king_table_middlegame,
+}
+piece_tables_endgame = dict(piece_tables_middlegame)
+piece_tables_endgame[Piece.PAWN] = pawn_table_endgame
+piece_tables_endgame[Piece.KING] = king_table_endgame
+
+# Material and table value of every piece code on every square, positive
+# for white and negative for black, so the score of a position is the sum
+# over its pieces. Chess keeps both sums in psqt_middlegame and psqt_endgame
+# while moves are played
+def get_piece_square_values(piece_tables):
+    values = [[0]*64 for i in range(16)]
+    for piece_type, table in piece_tables.items():
+        for square in range(64):
+            values[piece_code(Piece.WHITE, piece_type)][square] = material_values[piece_type] + table[63 - square]
+            values[piece_code(Piece.BLACK, piece_type)][square] = -material_values[piece_type] - table[square]
+    return values
+
+piece_square_middlegame = get_piece_square_values(piece_tables_middlegame)
+piece_square_endgame = get_piece_square_values(piece_tables_endgame)
+
+## Blend a middlegame and an endgame score by the phase, in centipawns ##
+def taper(middlegame, endgame, phase):
+    if phase > max_phase:
+        phase = max_phase
+    blend = middlegame * phase + endgame * (max_phase - phase)
+    # Rounded towards zero so mirrored positions score the same for each side
+    if blend < 0:
+        return -(-blend // max_phase)
+    return blend // max_phase
+
+# Rows of the occupancy matrix, the white pieces pawn to king then the black ones
+matrix_pieces = [(piece_color, piece_type) for piece_color in (Piece.WHITE, Piece.BLACK)
+                 for piece_type in (Piece.PAWN, Piece.KNIGHT, Piece.BISHOP, Piece.ROOK, Piece.QUEEN, Piece.KING)]
+# Middlegame values, endgame values and phase of each row, flattened to
+# match the occupancy matrix
+weight_matrix = np.array([[piece_square_middlegame[piece_code(piece_color, piece_type)],
+                           piece_square_endgame[piece_code(piece_color, piece_type)],
+                           [phase_values[piece_type]]*64]
+                          for piece_color, piece_type in matrix_pieces], dtype=np.int64)
+weight_vectors = weight_matrix.transpose(0, 2, 1).reshape(-1, 3)
+
+## 12x64 matrix of uint8 with a 1 on the square of every piece of each row ##
+def occupancy_matrix(pieceBB):
+    bitboards = np.array([pieceBB[piece_color] & pieceBB[piece_type] for piece_color, piece_type in matrix_pieces], dtype='<u8')
+    # Little endian bytes unpacked lowest bit first put square i in column i
+    return np.unpackbits(bitboards.view(np.uint8), bitorder='little').reshape(len(matrix_pieces), 64)
+
+## Middlegame and endgame material and piece square scores of a whole position for white ##
+def score_position(cb):
+    middlegame, endgame, phase = np.dot(occupancy_matrix(cb.pieceBB).ravel(), weight_vectors)
+    return int(middlegame), int(endgame)
+
+## Game phase of the pieces on the board, taper caps it at max_phase ##
+def game_phase(cb):
+    return sum(popcount(cb.pieceBB[piece_type]) * phase_values[piece_type]
+               for piece_type in (Piece.KNIGHT, Piece.BISHOP, Piece.ROOK, Piece.QUEEN))
+
+# Columns of a pieceBB board combined for each row of the occupancy matrix
+matrix_colors = np.array([piece_color for piece_color, piece_type in matrix_pieces])
+matrix_types = np.array([piece_type for piece_color, piece_type in matrix_pieces])
+float_weight_vectors = weight_vectors.astype(np.float32)
+# Boards unpacked at once by score_boards
+batch_size = 65536
+
+## Nx12x64 occupancy matrices of an Nx8 uint64 array of pieceBB boards ##
+def occupancy_matrices(boards):
+    boards = np.asarray(boards, dtype=np.uint64)
+    bitboards = np.ascontiguousarray(boards[:, matrix_colors] & boards[:, matrix_types], dtype='<u8')
+    bits = np.unpackbits(bitboards.view(np.uint8), axis=1, bitorder='little')
+    return bits.reshape(len(boards), len(matrix_pieces), 64)
+
+## Tapered scores of score_position for an Nx8 uint64 array of pieceBB boards ##
+def score_boards(boards):
+    boards = np.asarray(boards, dtype=np.uint64)
+    scores = np.empty(len(boards), dtype=np.int64)
+    for start in range(0, len(boards), batch_size):
+        matrices = occupancy_matrices(boards[start:start + batch_size])
+        # Float32 products run through BLAS and stay exact, every partial sum
+        # is an integer far below 2**24
+        matrices = matrices.reshape(len(matrices), -1).astype(np.float32)
+        middlegame, endgame, phase = np.rint(matrices @ float_weight_vectors).astype(np.int64).T
+        phase = np.minimum(phase, max_phase)
+        blend = middlegame * phase + endgame * (max_phase - phase)
+        # Rounded towards zero like taper
+        scores[start:start + batch_size] = np.sign(blend) * (np.abs(blend) // max_phase)
+
+    return scores
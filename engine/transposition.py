@@ -0,0 +1,125 @@
+from array import array
+from multiprocessing import shared_memory
+
+# Bound of a stored score
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Each entry is two 64 bit words, the position key and the packed data:
+# move 20 bits | score 32 bits | depth 7 bits | bound 2 bits | age 3 bits
+ENTRY_SIZE = 16
+MOVE_MASK = (1 << 20) - 1
+SCORE_SHIFT = 20
+SCORE_OFFSET = 1 << 31
+SCORE_MASK = (1 << 32) - 1
+DEPTH_SHIFT = 52
+DEPTH_MASK = 127
+BOUND_SHIFT = 59
+BOUND_MASK = 3
+AGE_SHIFT = 61
+AGE_MASK = 7
+
+class TranspositionTable():
+    # Size is given in megabytes and rounded down to a power of two of entries.
+    # A shared table lives in shared memory so search processes can use it
+    # together, other processes attach to it by passing its name
+    def __init__(self, size_mb=16, shared=False, name=None):
+        entries = 1
+        while entries * 2 * ENTRY_SIZE <= size_mb * 1024 * 1024:
+            entries = entries * 2
+
+        self.mask = entries - 1
+        self.age = 0
+        self.shared_memory = None
+        self.owner = False
+
+        if name is not None:
+            self.shared_memory = attach_shared_memory(name)
+        elif shared:
+            self.shared_memory = shared_memory.SharedMemory(create=True, size=ENTRY_SIZE * entries)
+            self.owner = True
+
+        if self.shared_memory is None:
+            self.keys = array('Q', bytes(8 * entries))
+            self.data = array('Q', bytes(8 * entries))
+        else:
+            self.keys = self.shared_memory.buf[:8 * entries].cast('Q')
+            self.data = self.shared_memory.buf[8 * entries:ENTRY_SIZE * entries].cast('Q')
+
+    def __len__(self):
+        return self.mask + 1
+
+    # Name other processes attach with, None if the table isn't shared
+    @property
+    def name(self):
+        return self.shared_memory.name if self.shared_memory is not None else None
+
+    def clear(self):
+        if self.shared_memory is None:
+            self.keys = array('Q', bytes(8 * len(self)))
+            self.data = array('Q', bytes(8 * len(self)))
+        else:
+            self.shared_memory.buf[:ENTRY_SIZE * len(self)] = bytes(ENTRY_SIZE * len(self))
+        self.age = 0
+
+    # Detach from the shared memory, the process that created it also frees it
+    def close(self):
+        if self.shared_memory is None:
+            return
+
+        self.keys.release()
+        self.data.release()
+        self.shared_memory.close()
+        if self.owner:
+            self.shared_memory.unlink()
+        self.shared_memory = None
+
+    # Called before every search so entries from older ones get replaced first
+    def new_search(self):
+        self.age = (self.age + 1) & AGE_MASK
+
+    ## Returns (depth, bound, score, move) stored for the key, or None ##
+    def probe(self, key):
+        index = key & self.mask
+        data = self.data[index]
+        # Keys are stored xored with the data, an entry half written by another
+        # process doesn't match any key
+        if data == 0 or self.keys[index] ^ data != key:
+            return None
+
+        score = ((data >> SCORE_SHIFT) & SCORE_MASK) - SCORE_OFFSET
+        depth = (data >> DEPTH_SHIFT) & DEPTH_MASK
+        bound = (data >> BOUND_SHIFT) & BOUND_MASK
+
+        return depth, bound, score, data & MOVE_MASK
+
+    ## Store a search result, scores are ints ##
+    def store(self, key, depth, bound, score, move):
+        index = key & self.mask
+        data = self.data[index]
+        same_position = self.keys[index] ^ data == key
+
+        # Keep a deeper entry of the same search unless it is the same position
+        if data != 0 and not same_position and (data >> AGE_SHIFT) == self.age:
+            if (data >> DEPTH_SHIFT) & DEPTH_MASK > depth:
+                return
+
+        # Keep the old best move if this result has none
+        if move == 0 and same_position:
+            move = data & MOVE_MASK
+
+        data = ((move & MOVE_MASK) | ((score + SCORE_OFFSET) << SCORE_SHIFT)
+                | (min(depth, DEPTH_MASK) << DEPTH_SHIFT) | (bound << BOUND_SHIFT)
+                | (self.age << AGE_SHIFT))
+        self.keys[index] = key ^ data
+        self.data[index] = data
+
+# Attach to shared memory made by another process, only the creator frees it.
+# Child processes share the creator's resource tracker so older pythons
+# without track can attach normally
+def attach_shared_memory(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
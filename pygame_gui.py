@@ -2,14 +2,20 @@ import os
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide" 
 import pygame
 import math
-from engine.chess_logic import Chess, Piece, Square
+from engine.chess_logic import Chess, Square
+from engine.move_constants import Move, EMPTY, PIECE_COLOR_SHIFT, PIECE_TYPE_MASK
 import engine.minimax as minimax
+from engine.book import load_book
+from engine.bitbase import get_bitbases
 
 SIZE = MAX_WIDTH, MAX_HEIGHT = 1024, 576  
 FPS = 200
 
 if __name__ == "__main__":
     chess_game = Chess()
+    minimax.Minimax.book = load_book()
+    # Built now if missing, searches never build them
+    get_bitbases()
     
     pygame.init()
     win = pygame.display.set_mode(SIZE)
@@ -64,15 +70,17 @@ if __name__ == "__main__":
                 
                 if piece_square != square:
                     if piece_moves:
-                        if not chess_game.current_board[square] or chess_game.current_board[square][0] != chess_game.player_turn:
+                        if not chess_game.current_board[square] or chess_game.current_board[square] >> PIECE_COLOR_SHIFT != chess_game.player_turn:
                             for move in piece_moves:
                                 if move.square_to == square:
                                     chess_game.move(move)
                                     moves = chess_game.get_legal_moves(chess_game.player_turn)
                                     board = chess_game.current_board
-                                    minimax.Minimax.node_number = 0
-                                    evaluation = minimax.Minimax.searchABPruning(chess_game, 2)
-                                    print("\nEvaluation:", evaluation)
+                                    result = minimax.Minimax.search(chess_game, time_limit=2)
+                                    if result.best_move:
+                                        best_move = Move.from_int(result.best_move)
+                                        print("\nBest move: %s%s" % (Square(best_move.square_from).name, Square(best_move.square_to).name))
+                                    print("\nEvaluation:", result.score, "depth:", result.depth)
                             piece_moves = []
                             piece_square = None
                         else:
@@ -82,7 +90,7 @@ if __name__ == "__main__":
                                     piece_moves.append(move)
                             piece_square = square
                     elif chess_game.current_board[square]:
-                        if chess_game.current_board[square][0] == chess_game.player_turn:
+                        if chess_game.current_board[square] >> PIECE_COLOR_SHIFT == chess_game.player_turn:
                             piece_moves = []
                             for move in moves:
                                 if move.square_from == square:
@@ -118,8 +126,8 @@ if __name__ == "__main__":
                 piece_x = pos_x + scale_offset
                 piece_y = pos_y + scale_offset
 
-                if board[63 - square] != None:
-                    win.blit(pieces_images[board[63 - square][0]][board[63 - square][1]-2], (piece_x, piece_y))   
+                if board[63 - square] != EMPTY:
+                    win.blit(pieces_images[board[63 - square] >> PIECE_COLOR_SHIFT][(board[63 - square] & PIECE_TYPE_MASK) - 2], (piece_x, piece_y))   
 
         if piece_moves:
             for move in piece_moves:
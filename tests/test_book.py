@@ -0,0 +1,41 @@
+from engine.chess_logic import Chess
+from engine.book import book_key
+from engine.perft import move_name
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+def play(cb, names):
+    for name in names:
+        move = [move for move in cb.generate_legal_moves(cb.player_turn) if move_name(move) == name][0]
+        cb.make_move(move)
+
+# Keys from the Polyglot book format description
+def test_published_keys():
+    cb = Chess()
+    cb.load_fen_position(START_FEN)
+    assert book_key(cb) == 0x463B96181691FC9C
+    play(cb, ["e2e4"])
+    assert book_key(cb) == 0x823C9B50FD114196
+    play(cb, ["d7d5"])
+    assert book_key(cb) == 0x0756B94461C50FB0
+    play(cb, ["e4e5"])
+    assert book_key(cb) == 0x662FAFB965DB29D4
+    # The en passant file counts once a pawn can take
+    play(cb, ["f7f5"])
+    assert book_key(cb) == 0x22A48B5A8E47FF78
+
+# The black king on e8 without the short castling right, the king and the
+# castling keys don't cancel each other out
+def test_black_king_without_short_castling():
+    cb = Chess()
+    cb.load_fen_position(START_FEN)
+    play(cb, ["g1f3", "g8f6", "g2g3", "h8g8"])
+    assert book_key(cb) == 0xB114A6E7A7F3044C
+
+def test_fen_positions():
+    cb = Chess()
+    for fen, key in [("r3k3/8/8/8/8/8/8/4K2R b K - 0 1", 0x60EF28D870CB35CB),
+                     ("4k3/8/8/8/8/8/8/4K3 w - - 0 1", 0x5E854D7A97EB14C6),
+                     ("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1", 0xFDA239CC692A6053)]:
+        cb.load_fen_position(fen)
+        assert book_key(cb) == key
@@ -0,0 +1,46 @@
+import random
+import numpy as np
+import pytest
+from engine.chess_logic import Chess
+from engine.minimax import Minimax
+from engine.perft import PERFT_SUITE
+
+# Boards, sides to move and evaluate without mobility of random positions
+def random_positions(count, seed=1):
+    rng = random.Random(seed)
+    cb = Chess()
+    boards = []
+    sides = []
+    scores = []
+    for i in range(count):
+        cb.load_fen_position(PERFT_SUITE[i % len(PERFT_SUITE)][1])
+        for j in range(rng.randrange(40)):
+            moves = cb.generate_legal_moves(cb.player_turn)
+            if not moves:
+                break
+            cb.make_move(rng.choice(moves))
+        # Positions without moves score as a loss, not by their material
+        if not cb.generate_legal_moves(cb.player_turn):
+            continue
+        boards.append(list(cb.pieceBB))
+        sides.append(int(cb.player_turn))
+        scores.append(Minimax.evaluate(cb))
+    return np.array(boards, dtype=np.uint64), np.array(sides), np.array(scores)
+
+@pytest.fixture
+def no_mobility(monkeypatch):
+    monkeypatch.setattr(Minimax, "mobility_middlegame", 0)
+    monkeypatch.setattr(Minimax, "mobility_endgame", 0)
+
+def test_batch_matches_evaluate(no_mobility):
+    boards, sides, scores = random_positions(500)
+    assert np.array_equal(Minimax.evaluate_batch(boards), scores)
+    # The side to move doesn't change the point of view, evaluate is for white
+    assert np.array_equal(Minimax.evaluate_batch(boards, sides), scores)
+
+def test_batch_relative(no_mobility):
+    boards, sides, scores = random_positions(200, seed=2)
+    relative = Minimax.evaluate_batch(boards, sides, relative=True)
+    assert np.array_equal(relative, np.where(sides == 1, -scores, scores))
+    with pytest.raises(ValueError):
+        Minimax.evaluate_batch(boards, relative=True)
@@ -0,0 +1,30 @@
+import pytest
+from engine.chess_logic import Chess
+from engine.minimax import Minimax, SearchOptions
+from engine.perft import PERFT_SUITE
+
+# Reductions larger than the depth left stop at the horizon
+@pytest.mark.parametrize("options", [
+    SearchOptions(null_move_reduction=3),
+    SearchOptions(null_move_reduction=6, null_move_min_depth=1),
+    SearchOptions(lmr_min_depth=1, lmr_full_moves=0, lmr_reduction=4),
+])
+def test_aggressive_options(options):
+    cb = Chess()
+    for name, fen, counts in PERFT_SUITE:
+        cb.load_fen_position(fen)
+        Minimax.set_table_size(1)
+        result = Minimax.search(cb, max_depth=4, options=options)
+        assert result is not None and result.best_move
+        assert len(cb.move_history) == 0
+
+@pytest.mark.parametrize("arguments", [
+    {"null_move_reduction": -1},
+    {"lmr_reduction": -1},
+    {"lmr_full_moves": -1},
+    {"null_move_min_depth": 0},
+    {"lmr_min_depth": 0},
+])
+def test_invalid_options(arguments):
+    with pytest.raises(ValueError):
+        SearchOptions(**arguments)